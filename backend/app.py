@@ -2,14 +2,57 @@ from __future__ import annotations
 
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Tuple
+import hashlib
+import json
+import math
 import os
+import tempfile
+import time
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 from elevenlabs.client import ElevenLabs
 
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_serving import serve_audio_file
+from jobs import JobQueue, ProgressFn, QueueFull
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    STAGE_DISK_WRITE,
+    STAGE_REQUEST_PARSE,
+    STAGE_STORE_UPDATE,
+    STAGE_UPSTREAM_TOTAL,
+    STAGE_UPSTREAM_TTFB,
+    StageMetrics,
+    render_gauges,
+)
+from mixer import (
+    BackingTrack,
+    Mixer,
+    MixError,
+    WavInstrumental,
+    file_chunks,
+    mix_blocks,
+    pcm_blocks,
+    tee_wav,
+    write_wav,
+)
+from mp3_frames import (
+    INDEX_SUFFIX,
+    FrameIndexBuilder,
+    IndexedMP3Writer,
+    concat_mp3,
+    index_path_for,
+    open_index,
+)
+from segments import count_changed_lines, resplit_lyrics, run_segments, split_lyrics
+from song_store import SongStore, new_song_id
+from streaming import LiveAudio, LiveAudioRegistry
+from tts_cache import TTSCache, link_or_copy, make_cache_key
+
 # ----------------------------------------------------------------------------
 # Basic Flask + ElevenLabs setup
 # ----------------------------------------------------------------------------
@@ -18,7 +61,7 @@ app = Flask(__name__)
 CORS(app)  # allow the Vite frontend at http://localhost:5173 to call this API
 
 BASE_DIR = Path(__file__).resolve().parent
-GENERATED_DIR = BASE_DIR / "generated"
+GENERATED_DIR = Path(os.getenv("GENERATED_DIR", str(BASE_DIR / "generated")))
 GENERATED_DIR.mkdir(parents=True, exist_ok=True)
 
 # Load environment and initialise ElevenLabs client
@@ -26,61 +69,446 @@ load_dotenv()
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 DEFAULT_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")  # optional default voice
 
+TTS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2")
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+
 eleven_client: ElevenLabs | None = None
 if ELEVENLABS_API_KEY:
     eleven_client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
 
+# Identical (lyrics, voice, model, format) requests are served from disk
+# instead of hitting ElevenLabs again. Budget is configurable via env and
+# shared by all worker processes using the same GENERATED_DIR.
+TTS_CACHE = TTSCache(
+    GENERATED_DIR / "cache",
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+    max_entries=int(os.getenv("TTS_CACHE_MAX_ENTRIES", "1000")),
+    companion_suffixes=(INDEX_SUFFIX,),
+)
+
+# Raw vocals for server-side mixing (`pcm_44100`: 16-bit mono 44.1 kHz).
+PCM_OUTPUT_FORMAT = "pcm_44100"
+PCM_CACHE = TTSCache(
+    GENERATED_DIR / "cache_pcm",
+    max_bytes=int(os.getenv("PCM_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+    max_entries=int(os.getenv("PCM_CACHE_MAX_ENTRIES", "200")),
+    suffix=".pcm",
+)
+
+# Background generation. Requests opt in with `?async=1` / `"async": true`;
+# SONG_GENERATION_ASYNC=1 makes async the default. Synchronous generation is
+# kept as the default so the current SongCreatorStudio client keeps working.
+SONG_GENERATION_ASYNC = os.getenv("SONG_GENERATION_ASYNC", "0").lower() in ("1", "true", "yes")
+JOB_QUEUE = JobQueue(
+    max_workers=int(os.getenv("SONG_JOB_WORKERS", "4")),
+    max_queued=int(os.getenv("SONG_JOB_MAX_QUEUED", "32")),
+)
+
+# Long lyrics are split into verse/line-aligned segments that are synthesized
+# in parallel and stitched at MP3 frame boundaries.
+SEGMENT_MAX_CHARS = int(os.getenv("SEGMENT_MAX_CHARS", "400"))
+SEGMENT_CONCURRENCY = int(os.getenv("SEGMENT_CONCURRENCY", "4"))
+SEGMENT_RETRIES = int(os.getenv("SEGMENT_RETRIES", "2"))
+SEGMENT_EXECUTOR = ThreadPoolExecutor(max_workers=SEGMENT_CONCURRENCY, thread_name_prefix="tts-segment")
+
+# Songs whose audio is still being streamed from ElevenLabs to disk. The
+# producers get their own queue so that a backlog of async generate jobs
+# never delays the first byte of a streamed song.
+LIVE_AUDIO = LiveAudioRegistry()
+STREAM_QUEUE = JobQueue(
+    max_workers=int(os.getenv("STREAM_WORKERS", "8")),
+    max_queued=int(os.getenv("STREAM_MAX_QUEUED", "32")),
+    name="stream-job",
+)
+
+# Per-stage latency histograms, exported at /api/metrics.
+METRICS = StageMetrics()
+
+# Song metadata and version history, shared by every worker process that
+# points at the same generated-audio directory.
+SONGS = SongStore(
+    Path(os.getenv("SONG_DB_PATH", str(GENERATED_DIR / "songs.sqlite3"))),
+    on_write=lambda seconds: METRICS.observe(STAGE_STORE_UPDATE, seconds),
+)
+SONG_PAGE_SIZE_MAX = 100
+
 
 # ----------------------------------------------------------------------------
 # Helpers
 # ----------------------------------------------------------------------------
 
-SONG_STORE: Dict[str, Dict[str, Any]] = {}
-
-
 def _make_song_id() -> str:
-    """Create a simple unique-ish song id.
+    """Create a unique song id.
 
-    For the current prototype we just use an incrementing counter; a UUID would
-    also be fine. This lives only in memory and resets when the server restarts.
+    Random rather than a counter so that ids never collide across threads or
+    worker processes sharing the song store.
     """
 
-    song_id = str(len(SONG_STORE) + 1)
-    return song_id
+    return new_song_id()
 
 
-def _synthesize_with_elevenlabs(text: str, voice_id: str | None, output_path: Path) -> Path:
-    """Call ElevenLabs Text-to-Speech API and write the result to output_path.
+def _resolve_voice_id(voice_id: str | None) -> str:
+    """Prefer an explicit voice id from the request; otherwise fall back to env."""
+
+    if not voice_id:
+        voice_id = DEFAULT_VOICE_ID
+
+    if not voice_id:
+        raise RuntimeError(
+            "No ElevenLabs voice id provided. Set ELEVENLABS_VOICE_ID or send 'voiceId' in the request body."
+        )
+    return voice_id
+
+
+def _request_json() -> Dict[str, Any]:
+    """The request's JSON body (or {}), timed as the request-parse stage."""
+
+    with METRICS.time(STAGE_REQUEST_PARSE):
+        return request.get_json(force=True, silent=True) or {}
+
+
+def _open_tts_stream(
+    text: str, voice_id: str | None, output_format: str = TTS_OUTPUT_FORMAT
+) -> Iterator[bytes]:
+    """Start an ElevenLabs Text-to-Speech request and yield audio chunks.
 
     Uses the official Python SDK as shown in the ElevenLabs quickstart docs.
+    Time spent waiting on ElevenLabs (but not on our consumer) is recorded as
+    the upstream TTFB / total stages.
     """
 
     if eleven_client is None:
         raise RuntimeError("ELEVENLABS_API_KEY is not configured on the server")
 
-    # Prefer an explicit voice id from the request; otherwise fall back to env.
-    if not voice_id:
-        voice_id = DEFAULT_VOICE_ID
+    voice_id = _resolve_voice_id(voice_id)
 
-    if not voice_id:
-        raise RuntimeError(
-            "No ElevenLabs voice id provided. Set ELEVENLABS_VOICE_ID or send 'voiceId' in the request body."
+    started = time.perf_counter()
+    audio_stream = iter(
+        eleven_client.text_to_speech.convert(
+            voice_id=voice_id,
+            model_id=TTS_MODEL_ID,
+            text=text,
+            output_format=output_format,
         )
+    )
+    waited = time.perf_counter() - started
+    first = True
+
+    while True:
+        t0 = time.perf_counter()
+        chunk = next(audio_stream, None)
+        waited += time.perf_counter() - t0
+        if chunk is None:
+            break
+        if first:
+            METRICS.observe(STAGE_UPSTREAM_TTFB, time.perf_counter() - started)
+            first = False
+        if isinstance(chunk, (bytes, bytearray)):
+            yield bytes(chunk)
+
+    METRICS.observe(STAGE_UPSTREAM_TOTAL, waited)
+
+
+def _synthesize_with_elevenlabs(text: str, voice_id: str | None, output_path: Path) -> Path:
+    """Call ElevenLabs Text-to-Speech API and write the result to output_path.
+
+    The MP3 frame index sidecar (`<output_path>.idx`) is built in the same
+    write loop, so durations and seek offsets never need a second pass.
+    """
 
     # Stream MP3 audio from ElevenLabs and write it to disk.
-    audio_stream = eleven_client.text_to_speech.convert(
-        voice_id=voice_id,
-        model_id="eleven_multilingual_v2",
-        text=text,
-        output_format="mp3_44100_128",
+    writing = 0.0
+    with IndexedMP3Writer(output_path) as f:
+        for chunk in _open_tts_stream(text, voice_id):
+            t0 = time.perf_counter()
+            f.write(chunk)
+            writing += time.perf_counter() - t0
+        t0 = time.perf_counter()
+    METRICS.observe(STAGE_DISK_WRITE, writing + time.perf_counter() - t0)
+
+    return output_path
+
+
+def _synthesize_cached(text: str, voice_id: str | None, output_path: Path) -> bool:
+    """Like `_synthesize_with_elevenlabs`, but served from `TTS_CACHE` if possible.
+
+    Concurrent requests for the same audio share a single upstream call.
+    Returns True when no new upstream call was needed.
+    """
+
+    voice_id = _resolve_voice_id(voice_id)
+    key = make_cache_key(text, voice_id, TTS_MODEL_ID, TTS_OUTPUT_FORMAT)
+    return TTS_CACHE.get_into(
+        key, output_path, lambda tmp_path: _synthesize_with_elevenlabs(text, voice_id, tmp_path)
     )
 
-    with open(output_path, "wb") as f:
-        for chunk in audio_stream:
-            if isinstance(chunk, (bytes, bytearray)):
+
+def _synthesize_pcm_cached(text: str, voice_id: str | None) -> Path:
+    """Raw PCM vocals for `text`, from `PCM_CACHE` or ElevenLabs."""
+
+    voice_id = _resolve_voice_id(voice_id)
+    key = make_cache_key(text, voice_id, TTS_MODEL_ID, PCM_OUTPUT_FORMAT)
+
+    def produce(tmp_path: Path) -> None:
+        writing = 0.0
+        with open(tmp_path, "wb") as f:
+            for chunk in _open_tts_stream(text, voice_id, PCM_OUTPUT_FORMAT):
+                t0 = time.perf_counter()
                 f.write(chunk)
+                writing += time.perf_counter() - t0
+        METRICS.observe(STAGE_DISK_WRITE, writing)
 
-    return output_path
+    path, _ = PCM_CACHE.get_or_create(key, produce)
+    return path
+
+
+def _audio_duration(audio_path: Path) -> float:
+    """Exact duration in seconds, from the file's frame index sidecar."""
+
+    with open_index(audio_path) as index:
+        return index.duration
+
+
+def _format_duration(seconds: float | None) -> str | None:
+    if seconds is None:
+        return None
+    whole = int(round(seconds))
+    return f"{whole // 60}:{whole % 60:02d}"
+
+
+def _segments_digest(keys: List[str]) -> str:
+    """Cache key of the audio stitched from segments with these cache keys.
+
+    A single segment is its own stitched file, so it shares that entry.
+    """
+
+    if len(keys) == 1:
+        return keys[0]
+    return hashlib.sha256("\0".join(["stitched", *keys]).encode("utf-8")).hexdigest()
+
+
+def _synthesize_segmented(
+    song_id: str,
+    segments: List[str],
+    voice_id: str | None,
+    output_path: Path,
+    progress: ProgressFn | None = None,
+) -> Tuple[bool, List[Dict[str, Any]], int]:
+    """Synthesize `segments` concurrently and stitch them into output_path.
+
+    Each segment goes through `_synthesize_cached` (so repeated verses are
+    free) with its own retries, and is kept under `segments/<song_id>/`,
+    named by its cache key. Segments already present there (from an earlier
+    version of the song) are reused without any synthesis.
+
+    Returns (all segments were cache hits, segment metadata, number of
+    distinct segments synthesized). Repeats of a segment count only once.
+    """
+
+    voice_id = _resolve_voice_id(voice_id)
+    segment_dir = GENERATED_DIR / "segments" / song_id
+    segment_dir.mkdir(parents=True, exist_ok=True)
+
+    keys = [make_cache_key(seg, voice_id, TTS_MODEL_ID, TTS_OUTPUT_FORMAT) for seg in segments]
+    paths = [segment_dir / f"{key}.mp3" for key in keys]
+
+    # One task per distinct segment that isn't on disk yet.
+    todo: Dict[str, Tuple[str, Path]] = {}
+    for seg, key, path in zip(segments, keys, paths):
+        if key not in todo and not path.exists():
+            todo[key] = (seg, path)
+
+    def on_done(finished: int) -> None:
+        if progress is not None:
+            progress(0.1 + 0.8 * finished / len(todo), "synthesizing")
+
+    hits = run_segments(
+        SEGMENT_EXECUTOR,
+        [seg for seg, _ in todo.values()],
+        [path for _, path in todo.values()],
+        lambda segment, path: _synthesize_cached(segment, voice_id, path),
+        SEGMENT_RETRIES,
+        on_done,
+    )
+
+    # The stitched file is cached too, so a song whose segments were all
+    # cached before is a hard link rather than a fresh copy of every frame.
+    with METRICS.time(STAGE_DISK_WRITE):
+        TTS_CACHE.get_into(_segments_digest(keys), output_path, lambda tmp: concat_mp3(paths, tmp))
+
+    segment_meta = [{"text": seg, "key": key} for seg, key in zip(segments, keys)]
+    return all(hits), segment_meta, len(todo)
+
+
+def _wants_async(data: Dict[str, Any]) -> bool:
+    flag = request.args.get("async")
+    if flag is None:
+        flag = data.get("async")
+    if flag is None:
+        return SONG_GENERATION_ASYNC
+    return str(flag).lower() in ("1", "true", "yes")
+
+
+def _build_song_meta(
+    song_id: str, data: Dict[str, Any], audio_path: Path, duration: float | None = None
+) -> Dict[str, Any]:
+    """Song metadata as returned to (and stored for) the frontend.
+
+    `duration` is unknown (None) while audio is still streaming.
+    """
+
+    return {
+        "id": song_id,
+        "title": data.get("title") or "Untitled",
+        "lyrics": (data.get("lyrics") or "").strip(),
+        "voiceOption": data.get("voiceOption"),
+        "voiceId": data.get("voiceId"),
+        "instrumentalOption": data.get("instrumentalOption") or "generate",
+        "genre": data.get("genre"),
+        "mood": data.get("mood"),
+        "tempo": data.get("tempo"),
+        # URL that the frontend can use for playback/download.
+        "audioUrl": f"/api/songs/{song_id}/audio",
+        # Never changes once written, so browsers may cache it forever.
+        "versionAudioUrl": f"/api/songs/{song_id}/versions/1/audio",
+        "duration": _format_duration(duration),
+        "durationSeconds": duration,
+        "timestamp": datetime.utcnow().isoformat(),
+        "version": 1,
+        "audioPath": str(audio_path),
+        "status": "ready",
+    }
+
+
+def _create_song(data: Dict[str, Any], progress: ProgressFn | None = None) -> Dict[str, Any]:
+    """Synthesize audio for a validated `generate_song` payload and store it.
+
+    Runs inline for synchronous requests and on a `JOB_QUEUE` worker for
+    async ones; `progress` is only supplied in the latter case.
+    """
+
+    def report(fraction: float, stage: str) -> None:
+        if progress is not None:
+            progress(fraction, stage)
+
+    lyrics: str = (data.get("lyrics") or "").strip()
+    # Optional explicit ElevenLabs voice id; otherwise we fall back to env.
+    voice_id: str | None = data.get("voiceId")
+
+    song_id = _make_song_id()
+
+    # Text that will be spoken by ElevenLabs. If there are no lyrics we
+    # synthesise a simple placeholder line.
+    text_to_speak = lyrics or "The melody begins now."
+
+    audio_path = GENERATED_DIR / f"song_{song_id}.mp3"
+
+    report(0.1, "synthesizing")
+    # Even single-segment songs go through here so that they have their
+    # segments on disk for incremental regeneration in `improve_song`
+    # (streamed songs don't; see `generate_song_stream`).
+    segments = split_lyrics(text_to_speak, SEGMENT_MAX_CHARS)
+    cache_hit, segment_meta, _ = _synthesize_segmented(
+        song_id, segments, voice_id, audio_path, progress
+    )
+    report(0.9, "saving")
+
+    song_meta = _build_song_meta(song_id, data, audio_path, _audio_duration(audio_path))
+    song_meta["cacheHit"] = cache_hit
+    song_meta["segments"] = segment_meta
+    song_meta["audioDigest"] = _segments_digest([seg["key"] for seg in segment_meta])
+
+    return SONGS.create(song_meta)
+
+
+def _stream_song_audio(song_id: str, key: str, text: str, voice_id: str, live: LiveAudio) -> Dict[str, Any]:
+    """Tee ElevenLabs chunks into `live` (the song file) as they arrive.
+
+    Registered as the `TTS_CACHE` producer for `key`, so ordinary requests for
+    the same audio coalesce onto this upstream call, and the finished file is
+    added to the cache. Runs on a `STREAM_QUEUE` worker.
+    """
+
+    live.begin()
+    index = FrameIndexBuilder(index_path_for(live.path))
+
+    def produce(tmp_path: Path) -> None:
+        writing = 0.0
+        for chunk in _open_tts_stream(text, voice_id):
+            t0 = time.perf_counter()
+            live.append(chunk)
+            index.feed(chunk)
+            writing += time.perf_counter() - t0
+        live.finish()
+        index.close()
+        METRICS.observe(STAGE_DISK_WRITE, writing)
+        link_or_copy(live.path, tmp_path, (INDEX_SUFFIX,))
+
+    try:
+        cached_path, hit = TTS_CACHE.get_or_create(key, produce)
+        if hit:
+            # Someone else synthesized the same audio while we were queued;
+            # replay their file through `live` so attached readers get it.
+            with open(cached_path, "rb") as f:
+                for block in iter(lambda: f.read(64 * 1024), b""):
+                    live.append(block)
+                    index.feed(block)
+            live.finish()
+            index.close()
+    except Exception as exc:
+        live.finish(exc)
+        index.abort()
+        followers = LIVE_AUDIO.seal(key, live)
+        # The truncated file must never be served as the song's audio.
+        for partial in (live.path, index_path_for(live.path)):
+            partial.unlink(missing_ok=True)
+        _fail_live_songs([song_id, *followers], exc)
+        raise
+
+    followers = LIVE_AUDIO.seal(key, live)
+    # Stay registered until the status is stored, so readers in this process
+    # keep following `live` instead of hitting the "still streaming" 503.
+    try:
+        duration = _audio_duration(live.path)
+        fields = {
+            "status": "ready",
+            "durationSeconds": duration,
+            "duration": _format_duration(duration),
+        }
+        # Streamed songs are always version 1; only record the outcome so an
+        # improvement or mix made meanwhile is not overwritten.
+        song = SONGS.set_fields(song_id, 1, {**fields, "cacheHit": hit})
+        for follower_id in followers:
+            # Requests that joined mid-stream get their own link to the file.
+            try:
+                link_or_copy(live.path, GENERATED_DIR / f"song_{follower_id}.mp3", (INDEX_SUFFIX,))
+            except OSError as exc:
+                SONGS.set_fields(follower_id, 1, {"status": "failed", "error": str(exc)})
+            else:
+                SONGS.set_fields(follower_id, 1, {**fields, "cacheHit": True})
+    finally:
+        for live_id in (song_id, *followers):
+            LIVE_AUDIO.discard(live_id)
+    return song
+
+
+def _fail_live_songs(song_ids: List[str], exc: BaseException) -> None:
+    """Mark streamed songs failed and stop routing their readers to live audio."""
+
+    try:
+        for song_id in song_ids:
+            SONGS.set_fields(song_id, 1, {"status": "failed", "error": str(exc)})
+    finally:
+        for song_id in song_ids:
+            LIVE_AUDIO.discard(song_id)
+
+
+def _follow_live_audio(song_id: str, live: LiveAudio) -> Any:
+    return Response(
+        live.follow(),
+        mimetype="audio/mpeg",
+        headers={"X-Song-Id": song_id, "Cache-Control": "no-store"},
+    )
 
 
 # ----------------------------------------------------------------------------
@@ -95,6 +523,33 @@ def health() -> Any:
     return jsonify({"status": "ok", "time": datetime.utcnow().isoformat()}), 200
 
 
+@app.route("/api/cache/stats", methods=["GET"])
+def cache_stats() -> Any:
+    """Hit/miss counters and size of the TTS result cache."""
+
+    return jsonify(TTS_CACHE.stats()), 200
+
+
+@app.route("/api/jobs/stats", methods=["GET"])
+def job_stats() -> Any:
+    """Current load on the background generation queue."""
+
+    return jsonify(JOB_QUEUE.stats()), 200
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics() -> Any:
+    """Per-stage latency histograms plus cache/queue gauges, for Prometheus."""
+
+    body = (
+        METRICS.render()
+        + render_gauges("tts_cache", TTS_CACHE.stats(), "TTS result cache")
+        + render_gauges("song_jobs", JOB_QUEUE.stats(), "Background generation queue")
+        + render_gauges("stream_jobs", STREAM_QUEUE.stats(), "Streaming synthesis queue")
+    )
+    return Response(body, content_type=METRICS_CONTENT_TYPE)
+
+
 @app.route("/api/generate-song", methods=["POST"])
 def generate_song() -> Any:
     """Stub endpoint that mimics song generation.
@@ -113,69 +568,233 @@ def generate_song() -> Any:
       - genre: str
       - mood: str
       - tempo: int/BPM
+      - async: bool (or `?async=1`) - return 202 + job id instead of waiting
     """
 
-    data = request.get_json(force=True, silent=True) or {}
+    data = _request_json()
 
     lyrics: str = (data.get("lyrics") or "").strip()
-    voice_option: str | None = data.get("voiceOption")
-    # Optional explicit ElevenLabs voice id; otherwise we fall back to env.
-    voice_id: str | None = data.get("voiceId")
-
-    instrumental_option: str = data.get("instrumentalOption") or "generate"
-    genre: str | None = data.get("genre")
-    mood: str | None = data.get("mood")
-    tempo: int | None = data.get("tempo")
 
     if not lyrics and not data.get("hasRecording"):
         return jsonify({"error": "No lyrics or vocal recording provided"}), 400
 
-    song_id = _make_song_id()
+    if _wants_async(data):
+        try:
+            job = JOB_QUEUE.submit("generate-song", lambda progress: _create_song(data, progress))
+        except QueueFull as exc:
+            resp = jsonify({"error": "queue_full", "retryAfter": exc.retry_after})
+            resp.headers["Retry-After"] = str(exc.retry_after)
+            return resp, 429
 
-    # Text that will be spoken by ElevenLabs. If there are no lyrics we
-    # synthesise a simple placeholder line.
-    text_to_speak = lyrics or "The melody begins now."
-
-    audio_path = GENERATED_DIR / f"song_{song_id}.mp3"
+        body = job.to_dict()
+        body["statusUrl"] = f"/api/jobs/{job.id}"
+        body["eventsUrl"] = f"/api/jobs/{job.id}/events"
+        resp = jsonify(body)
+        resp.headers["Location"] = body["statusUrl"]
+        return resp, 202
 
     try:
-        _synthesize_with_elevenlabs(text_to_speak, voice_id, audio_path)
+        song_meta = _create_song(data)
     except Exception as exc:  # pragma: no cover - logged for debugging only
         return (
             jsonify({"error": "tts_failed", "detail": str(exc)}),
             500,
         )
 
-    song_meta: Dict[str, Any] = {
-        "id": song_id,
-        "title": data.get("title") or "Untitled",
-        "lyrics": lyrics,
-        "voiceOption": voice_option,
-        "instrumentalOption": instrumental_option,
-        "genre": genre,
-        "mood": mood,
-        "tempo": tempo,
-        # URL that the frontend can use for playback/download.
-        "audioUrl": f"/api/songs/{song_id}/audio",
-        "duration": "3:45",  # fake duration for prototype UI
-        "timestamp": datetime.utcnow().isoformat(),
-        "version": 1,
-        "audioPath": str(audio_path),
-    }
+    return jsonify(song_meta), 201
 
-    SONG_STORE[song_id] = song_meta
 
-    return jsonify(song_meta), 201
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str) -> Any:
+    """Poll the status/progress of an async generation job."""
+
+    snapshot = JOB_QUEUE.snapshot(job_id)
+    if snapshot is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(snapshot), 200
+
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id: str) -> Any:
+    """Server-Sent Events stream of job updates; closes once the job finishes."""
+
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        for snapshot in JOB_QUEUE.watch(job):
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/generate-song/stream", methods=["POST"])
+def generate_song_stream() -> Any:
+    """Like `generate_song`, but respond with the audio itself as it is made.
+
+    Chunks are forwarded from ElevenLabs with chunked transfer encoding while
+    also being written to `song_<id>.mp3`, so playback can start after the
+    first chunk instead of after the whole synthesis. The song id is returned
+    in the `X-Song-Id` header; metadata is at `/api/songs/<id>` afterwards
+    and other clients can attach via `/api/songs/<id>/stream` meanwhile.
+
+    The lyrics are synthesized in one upstream call, not per segment, so a
+    streamed song has no `segments` yet: its first improvement synthesizes
+    every segment, and only later ones are incremental.
+    """
+
+    data = _request_json()
+    lyrics: str = (data.get("lyrics") or "").strip()
+
+    if not lyrics and not data.get("hasRecording"):
+        return jsonify({"error": "No lyrics or vocal recording provided"}), 400
+
+    try:
+        voice_id = _resolve_voice_id(data.get("voiceId"))
+    except RuntimeError as exc:
+        return jsonify({"error": "tts_failed", "detail": str(exc)}), 500
+
+    text_to_speak = lyrics or "The melody begins now."
+    key = make_cache_key(text_to_speak, voice_id, TTS_MODEL_ID, TTS_OUTPUT_FORMAT)
+
+    song_id = _make_song_id()
+    audio_path = GENERATED_DIR / f"song_{song_id}.mp3"
+    song_meta = _build_song_meta(song_id, data, audio_path)
+    song_meta["audioDigest"] = key
+
+    if TTS_CACHE.lookup_into(key, audio_path):
+        song_meta["cacheHit"] = True
+        song_meta["durationSeconds"] = _audio_duration(audio_path)
+        song_meta["duration"] = _format_duration(song_meta["durationSeconds"])
+        SONGS.create(song_meta)
+        resp = get_song_audio(song_id)
+        resp.headers["X-Song-Id"] = song_id
+        return resp
+
+    song_meta["status"] = "streaming"
+    SONGS.create(song_meta)
+    live, started = LIVE_AUDIO.start_or_join(song_id, audio_path, key)
+    if not started:
+        # The same audio is already being streamed for another request:
+        # follow it from the start; its producer finishes this song too.
+        return _follow_live_audio(song_id, live)
+
+    try:
+        STREAM_QUEUE.submit(
+            "stream-song",
+            lambda progress: _stream_song_audio(song_id, key, text_to_speak, voice_id, live),
+        )
+    except QueueFull as exc:
+        followers = LIVE_AUDIO.seal(key, live)
+        LIVE_AUDIO.discard(song_id)
+        live.finish(exc)
+        audio_path.unlink(missing_ok=True)
+        SONGS.delete(song_id)
+        _fail_live_songs(followers, exc)
+        resp = jsonify({"error": "queue_full", "retryAfter": exc.retry_after})
+        resp.headers["Retry-After"] = str(exc.retry_after)
+        return resp, 429
+
+    return _follow_live_audio(song_id, live)
+
+
+@app.route("/api/songs/<song_id>/stream", methods=["GET"])
+def stream_song_audio(song_id: str) -> Any:
+    """Attach to an in-progress synthesis, or serve the finished file."""
+
+    live = LIVE_AUDIO.get(song_id)
+    if live is not None:
+        return _follow_live_audio(song_id, live)
+    return get_song_audio(song_id)
+
+
+@app.route("/api/songs", methods=["GET"])
+def list_songs() -> Any:
+    """Newest-first, cursor-paginated song listing.
+
+    Query params: `limit` (default 20, max 100), `cursor` (from the previous
+    page's `nextCursor`), and optional `genre` / `mood` filters.
+    """
+
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, SONG_PAGE_SIZE_MAX))
+
+    try:
+        songs, next_cursor = SONGS.list_page(
+            limit,
+            cursor=request.args.get("cursor"),
+            genre=request.args.get("genre"),
+            mood=request.args.get("mood"),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    return jsonify({"songs": songs, "nextCursor": next_cursor}), 200
+
+
+@app.route("/api/songs/<song_id>", methods=["GET"])
+def get_song(song_id: str) -> Any:
+    """Return stored metadata for a song."""
+
+    song = SONGS.get(song_id)
+    if not song:
+        return jsonify({"error": "Song not found"}), 404
+    return jsonify(song), 200
 
 
 @app.route("/api/songs/<song_id>/audio", methods=["GET"])
 def get_song_audio(song_id: str) -> Any:
-    """Serve the generated audio file for playback/download."""
+    """Serve the generated audio file for playback/download.
+
+    Supports Range (including multi-range) and conditional requests, and
+    `?t=<seconds>` to start playback at the MP3 frame containing that time.
+    """
 
-    song = SONG_STORE.get(song_id)
+    song = SONGS.get(song_id)
     if not song:
         return jsonify({"error": "Song not found"}), 404
 
+    # Still being synthesized: the file on disk is incomplete, so follow it.
+    live = LIVE_AUDIO.get(song_id)
+    if live is not None:
+        return _follow_live_audio(song_id, live)
+    if song.get("status") == "streaming":
+        # Being written by another worker process; we can't follow it here.
+        resp = jsonify({"error": "Audio is still being generated"})
+        resp.headers["Retry-After"] = "2"
+        return resp, 503
+
+    return _serve_song_file(song, immutable=False)
+
+
+@app.route("/api/songs/<song_id>/versions/<int:version>/audio", methods=["GET"])
+def get_song_version_audio(song_id: str, version: int) -> Any:
+    """Serve the audio of one specific song version with immutable caching."""
+
+    song = SONGS.get_version(song_id, version)
+    if not song:
+        return jsonify({"error": "Song version not found"}), 404
+    if song.get("status") == "streaming":
+        return get_song_audio(song_id)
+
+    return _serve_song_file(song, immutable=True)
+
+
+def _serve_song_file(song: Dict[str, Any], immutable: bool) -> Any:
+    if song.get("status") == "failed":
+        return jsonify({"error": "Audio generation failed", "detail": song.get("error")}), 410
+
     audio_path_str = song.get("audioPath")
     if not audio_path_str:
         return jsonify({"error": "Audio not available for this song"}), 404
@@ -184,40 +803,279 @@ def get_song_audio(song_id: str) -> Any:
     if not audio_path.exists():
         return jsonify({"error": "Audio file is missing on the server"}), 404
 
-    return send_from_directory(
-        directory=str(audio_path.parent),
-        path=audio_path.name,
-        as_attachment=False,
-        mimetype="audio/mpeg",
+    # Songs stored before `audioDigest` existed fall back to inode validators.
+    digest = song.get("audioDigest")
+    seek = request.args.get("t")
+    if seek is None:
+        return serve_audio_file(request, audio_path, "audio/mpeg", immutable=immutable, digest=digest)
+
+    try:
+        seconds = float(seek)
+    except ValueError:
+        seconds = math.nan
+    if not math.isfinite(seconds):
+        return jsonify({"error": "t must be a number of seconds"}), 400
+
+    with open_index(audio_path) as index:
+        offset, start_time = index.locate(seconds)
+    resp = serve_audio_file(
+        request, audio_path, "audio/mpeg", immutable=immutable, offset=offset, digest=digest
     )
+    resp.headers["X-Start-Time"] = f"{start_time:.6f}"
+    return resp
+
+
+@app.route("/api/songs/<song_id>/mix", methods=["POST"])
+def mix_song(song_id: str) -> Any:
+    """Mix the song's vocals with an instrumental on the server.
+
+    Vocals are requested from ElevenLabs as PCM and mixed block by block with
+    either an uploaded instrumental or a backing track generated from the
+    song's genre/mood/tempo. The result is written to a WAV file that is
+    served from `GET /api/songs/<id>/mix`.
+
+    Accepts JSON or multipart form data (all optional):
+      - instrumental: file - 16-bit 44.1 kHz WAV (multipart only)
+      - instrumentalOption: "generate" or "upload" (defaults to the song's)
+      - genre, mood, tempo: override the song's values for the backing track
+      - vocalGain, instrumentalGain, duckDepth: mixer settings
+      - stream: bool (or `?stream=1`) - respond with the WAV as it is mixed
+    """
+
+    song = SONGS.get(song_id)
+    if not song:
+        return jsonify({"error": "Song not found"}), 404
+
+    data: Dict[str, Any]
+    if request.form:
+        data = dict(request.form)
+    else:
+        data = _request_json()
+    option = data.get("instrumentalOption") or song.get("instrumentalOption") or "generate"
+    upload = request.files.get("instrumental")
+
+    if option == "upload" and upload is None:
+        return jsonify({"error": "instrumental file is required for instrumentalOption=upload"}), 400
+
+    try:
+        mixer = Mixer(
+            vocal_gain=float(data.get("vocalGain", 1.0)),
+            instrumental_gain=float(data.get("instrumentalGain", 0.6)),
+            duck_depth=float(data.get("duckDepth", 0.5)),
+        )
+        tempo = data.get("tempo") or song.get("tempo")
+        tempo = float(tempo) if tempo else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "gains and tempo must be numbers"}), 400
+
+    upload_path: Path | None = None
+    if option == "upload":
+        upload_dir = GENERATED_DIR / "uploads"
+        upload_dir.mkdir(exist_ok=True)
+        upload_path = upload_dir / f"{_make_song_id()}.wav"
+        upload.save(upload_path)
+        try:
+            instrumental: BackingTrack | WavInstrumental = WavInstrumental(upload_path)
+        except MixError as exc:
+            upload_path.unlink()
+            return jsonify({"error": "invalid_instrumental", "detail": str(exc)}), 400
+    else:
+        instrumental = BackingTrack(
+            tempo, data.get("genre") or song.get("genre"), data.get("mood") or song.get("mood")
+        )
+
+    def cleanup() -> None:
+        if isinstance(instrumental, WavInstrumental):
+            instrumental.close()
+        if upload_path is not None:
+            upload_path.unlink(missing_ok=True)
+
+    try:
+        text_to_speak = song.get("lyrics") or "The melody begins now."
+        vocals_path = _synthesize_pcm_cached(text_to_speak, song.get("voiceId"))
+    except Exception as exc:  # pragma: no cover - logged for debugging only
+        cleanup()
+        return jsonify({"error": "tts_failed", "detail": str(exc)}), 500
+
+    mix_path = GENERATED_DIR / f"mix_{song_id}_v{song['version']}.wav"
+    # Mix into a private temp file and only move it over `mix_path` once it
+    # is complete, so an aborted or concurrent mix never clobbers the
+    # recorded one.
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{mix_path.name}.", suffix=".tmp", dir=GENERATED_DIR)
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    blocks = mix_blocks(pcm_blocks(file_chunks(vocals_path)), instrumental, mixer)
+
+    def record() -> Dict[str, Any] | None:
+        os.replace(tmp_path, mix_path)
+        # Only the version the mix was made from; the song may have been
+        # improved while we were synthesizing and mixing.
+        return SONGS.set_fields(
+            song_id,
+            song["version"],
+            {"mixPath": str(mix_path), "mixUrl": f"/api/songs/{song_id}/mix"},
+        )
+
+    stream = request.args.get("stream", data.get("stream"))
+    if stream is not None and str(stream).lower() in ("1", "true", "yes"):
+
+        def body() -> Iterator[bytes]:
+            try:
+                yield from tee_wav(blocks, tmp_path)
+                record()
+            finally:
+                tmp_path.unlink(missing_ok=True)
+                cleanup()
+
+        return Response(body(), mimetype="audio/wav", headers={"Cache-Control": "no-store"})
+
+    try:
+        write_wav(blocks, tmp_path)
+        mixed = record()
+    finally:
+        tmp_path.unlink(missing_ok=True)
+        cleanup()
+    if mixed is None:
+        return jsonify({"error": "Song not found"}), 404
+    return jsonify(mixed), 201
+
+
+@app.route("/api/songs/<song_id>/mix", methods=["GET"])
+def get_song_mix(song_id: str) -> Any:
+    """Serve the server-side mix produced by `mix_song`."""
+
+    song = SONGS.get(song_id)
+    if not song:
+        return jsonify({"error": "Song not found"}), 404
+
+    mix_path_str = song.get("mixPath")
+    if not mix_path_str or not Path(mix_path_str).exists():
+        return jsonify({"error": "No mix available for this song"}), 404
+
+    return serve_audio_file(request, Path(mix_path_str), "audio/wav")
 
 
 @app.route("/api/songs/<song_id>/improve", methods=["POST"])
 def improve_song(song_id: str) -> Any:
-    """Very small stub for the "regenerate with feedback" step.
+    """Regenerate a song from feedback and/or revised lyrics or voice.
 
-    Accepts JSON:
+    Accepts JSON (at least one field required):
       - feedback: str
+      - lyrics: str - revised lyrics
+      - voiceId: str - different ElevenLabs voice
 
-    and bumps the in‑memory song version / timestamp. Real audio regeneration
-    should be plugged in here later.
+    and appends a new song version (earlier versions stay in the history).
+    When lyrics or voice change, the new lyrics are re-split so that lines
+    unchanged since the previous version keep their old segments; only the
+    edited segments are synthesized, and the previous version's segment
+    audio is reused for the rest (streamed songs have no segments until
+    their first improvement). The response (but not the stored song)
+    reports `segmentsReused`, `segmentsSynthesized` and `changedLines`.
+
+    Songs that are still streaming are rejected with 409 until they finish.
     """
 
-    if song_id not in SONG_STORE:
+    song = SONGS.get(song_id)
+    if not song:
         return jsonify({"error": "Song not found"}), 404
+    if song.get("status") == "streaming":
+        # The stream records its outcome on version 1 only; a version based
+        # on it now would stay "streaming" forever.
+        resp = jsonify({"error": "Song is still being generated"})
+        resp.headers["Retry-After"] = "2"
+        return resp, 409
+
+    data = _request_json()
+    for field in ("feedback", "lyrics", "voiceId"):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return jsonify({"error": f"{field} must be a string"}), 400
 
-    data = request.get_json(force=True, silent=True) or {}
     feedback: str = (data.get("feedback") or "").strip()
+    new_lyrics: str | None = data.get("lyrics")
+    new_voice_id: str | None = data.get("voiceId")
+
+    if new_lyrics is not None:
+        new_lyrics = new_lyrics.strip()
+        if not new_lyrics:
+            return jsonify({"error": "lyrics must not be empty"}), 400
+
+    if not feedback and new_lyrics is None and not new_voice_id:
+        return jsonify({"error": "feedback, lyrics or voiceId is required"}), 400
+
+    lyrics_changed = new_lyrics is not None and new_lyrics != song.get("lyrics")
+    voice_changed = bool(new_voice_id) and new_voice_id != song.get("voiceId")
 
-    if not feedback:
-        return jsonify({"error": "feedback is required"}), 400
+    if lyrics_changed or voice_changed:
+        old_text = song.get("lyrics") or "The melody begins now."
+        text_to_speak = new_lyrics if lyrics_changed else old_text
+        voice_id = new_voice_id if voice_changed else song.get("voiceId")
+        previous = [seg["text"] for seg in song.get("segments") or []]
+        segments = resplit_lyrics(text_to_speak, previous, SEGMENT_MAX_CHARS)
+
+        try:
+            # Name the file after its content so each version's audio is immutable.
+            resolved_voice_id = _resolve_voice_id(voice_id)
+            keys = [
+                make_cache_key(seg, resolved_voice_id, TTS_MODEL_ID, TTS_OUTPUT_FORMAT)
+                for seg in segments
+            ]
+            digest = _segments_digest(keys)
+            audio_path = GENERATED_DIR / f"song_{song_id}_{digest[:16]}.mp3"
+            cache_hit, segment_meta, synthesized = _synthesize_segmented(
+                song_id, segments, voice_id, audio_path
+            )
+        except Exception as exc:  # pragma: no cover - logged for debugging only
+            return jsonify({"error": "tts_failed", "detail": str(exc)}), 500
+
+        song.update(
+            {
+                "lyrics": text_to_speak if lyrics_changed else song.get("lyrics"),
+                "voiceId": voice_id,
+                "audioPath": str(audio_path),
+                "audioDigest": digest,
+                "segments": segment_meta,
+                "cacheHit": cache_hit,
+                "status": "ready",
+            }
+        )
+        # New audio replaces whatever failure the previous version recorded.
+        song.pop("error", None)
+        stats = {
+            "segmentsReused": len(segments) - synthesized,
+            "segmentsSynthesized": synthesized,
+            "changedLines": count_changed_lines(old_text, text_to_speak),
+        }
+        song["durationSeconds"] = _audio_duration(audio_path)
+        song["duration"] = _format_duration(song["durationSeconds"])
+        # Any earlier mix belongs to the previous version's vocals.
+        song.pop("mixPath", None)
+        song.pop("mixUrl", None)
+    else:
+        stats = {
+            "segmentsReused": len(song.get("segments") or []),
+            "segmentsSynthesized": 0,
+            "changedLines": 0,
+        }
 
-    song = SONG_STORE[song_id]
-    song["version"] = int(song.get("version") or 1) + 1
     song["timestamp"] = datetime.utcnow().isoformat()
-    song["lastFeedback"] = feedback
+    song["lastFeedback"] = feedback or song.get("lastFeedback")
+    song = SONGS.add_version(song)
+    version_url = f"/api/songs/{song_id}/versions/{song['version']}/audio"
+    song = SONGS.set_fields(song_id, song["version"], {"versionAudioUrl": version_url}) or song
 
-    return jsonify(song), 200
+    # Reuse statistics describe this request, not the song, so they are only
+    # part of the response.
+    return jsonify({**song, **stats}), 200
+
+
+@app.route("/api/songs/<song_id>/versions", methods=["GET"])
+def get_song_versions(song_id: str) -> Any:
+    """Full version history of a song, oldest first."""
+
+    versions = SONGS.versions(song_id)
+    if not versions:
+        return jsonify({"error": "Song not found"}), 404
+    return jsonify({"id": song_id, "versions": versions}), 200
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import mmap
+import os
+import uuid
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from flask import Request, Response
+from werkzeug.http import http_date, parse_date
+from werkzeug.wsgi import wrap_file
+
+# ----------------------------------------------------------------------------
+# Range / conditional file responses for audio playback
+# ----------------------------------------------------------------------------
+
+# Browsers seek with a single open-ended range; more than this many ranges in
+# one request is treated as abuse and answered with the full file instead.
+MAX_RANGES = 16
+BLOCK_SIZE = 256 * 1024
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+ByteRange = Tuple[int, int]  # inclusive start, exclusive stop
+
+
+class _FileSlice:
+    """Read-only view of ``length`` bytes of a file starting at ``start``.
+
+    Exposes ``fileno()`` so a server-provided ``wsgi.file_wrapper`` (gunicorn,
+    uWSGI) can hand the descriptor to ``sendfile(2)`` - the file is seeked to
+    ``start`` with an unbuffered handle, and the server stops at
+    Content-Length. Servers without sendfile fall back to bounded ``read``.
+    """
+
+    def __init__(self, path: Path, start: int, length: int) -> None:
+        self._fh = open(path, "rb", buffering=0)
+        self._fh.seek(start)
+        self._remaining = length
+
+    def fileno(self) -> int:
+        return self._fh.fileno()
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fh.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def make_etag(st: os.stat_result, digest: str | None = None) -> str:
+    """Strong validator derived from a content digest and size.
+
+    Without ``digest`` it falls back to inode, size and mtime (ns), which
+    changes whenever the file is rewritten but also whenever another link to
+    the same inode is touched.
+    """
+
+    if digest is not None:
+        return f'"{digest[:32]}-{st.st_size:x}"'
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_ranges(header: str | None, size: int) -> List[ByteRange] | None:
+    """Parse a ``Range: bytes=...`` header against a file of ``size`` bytes.
+
+    Returns None when the header is absent or malformed (serve the full
+    file), an empty list when no range is satisfiable (416), or the sorted,
+    coalesced list of ranges otherwise.
+    """
+
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges: List[ByteRange] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if not sep:
+            return None
+        try:
+            if not first:
+                # Suffix range: the final N bytes.
+                n = int(last)
+                if n < 0:
+                    return None
+                if n == 0:
+                    continue
+                ranges.append((max(size - n, 0), size))
+                continue
+            start = int(first)
+            stop = int(last) + 1 if last else size
+        except ValueError:
+            return None
+        if start < 0 or (last and stop <= start):
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(stop, size)))
+
+    ranges.sort()
+    merged: List[ByteRange] = []
+    for start, stop in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def _not_modified(req: Request, etag: str, mtime: float) -> bool:
+    if_none_match = req.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+    since = parse_date(req.headers.get("If-Modified-Since"))
+    return since is not None and int(mtime) <= since.timestamp()
+
+
+def _if_range_matches(req: Request, etag: str, mtime: float) -> bool:
+    if_range = req.headers.get("If-Range")
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range == etag
+    date = parse_date(if_range)
+    return date is not None and int(mtime) == int(date.timestamp())
+
+
+def _mmap_multipart(
+    path: Path, base: int, ranges: List[ByteRange], size: int, mimetype: str, boundary: str
+) -> Tuple[Iterator[bytes], int]:
+    """Body and exact length of a ``multipart/byteranges`` response.
+
+    Ranges are sliced straight out of an mmap of the file, so there is no
+    per-block read() syscall and no intermediate buffering of whole ranges.
+    """
+
+    heads = [
+        (
+            f"--{boundary}\r\nContent-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n"
+        ).encode("ascii")
+        for start, stop in ranges
+    ]
+    tail = f"--{boundary}--\r\n".encode("ascii")
+    length = sum(len(h) + (stop - start) + 2 for h, (start, stop) in zip(heads, ranges)) + len(tail)
+
+    def body() -> Iterator[bytes]:
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for head, (start, stop) in zip(heads, ranges):
+                    yield head
+                    for pos in range(base + start, base + stop, BLOCK_SIZE):
+                        # WSGI bodies must be bytes, so each block is copied
+                        # once out of the page cache.
+                        yield bytes(view[pos:min(pos + BLOCK_SIZE, base + stop)])
+                    yield b"\r\n"
+                yield tail
+            finally:
+                view.release()
+
+    return body(), length
+
+
+def serve_audio_file(
+    req: Request,
+    path: Path,
+    mimetype: str,
+    immutable: bool = False,
+    offset: int = 0,
+    digest: str | None = None,
+) -> Response:
+    """Serve ``path`` honouring conditional and Range requests.
+
+    - ``ETag`` / ``Last-Modified`` validators with ``304 Not Modified``
+    - single ``Range`` -> ``206`` sent via sendfile where the server supports it
+    - multiple ranges -> ``206 multipart/byteranges`` built from an mmap
+    - unsatisfiable ranges -> ``416``
+    - ``immutable`` for URLs whose content can never change (versioned audio)
+
+    With ``offset`` the response represents the file from that byte onwards
+    (used for time-based seeking); ranges are relative to that representation.
+    ``digest`` identifies the content (e.g. its TTS cache key) and makes the
+    ETag independent of the file's inode metadata.
+    """
+
+    st = path.stat()
+    offset = min(max(offset, 0), st.st_size)
+    size = st.st_size - offset
+    etag = make_etag(st, digest)
+    if offset:
+        etag = f'{etag[:-1]}@{offset:x}"'
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(st.st_mtime),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+    }
+
+    if _not_modified(req, etag, st.st_mtime):
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    if _if_range_matches(req, etag, st.st_mtime):
+        ranges = parse_ranges(req.headers.get("Range"), size)
+
+    if ranges is not None and not ranges:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    if ranges is None:
+        start, length, status = 0, size, 200
+    elif len(ranges) == 1:
+        start, stop = ranges[0]
+        length, status = stop - start, 206
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    else:
+        boundary = uuid.uuid4().hex
+        body, length = _mmap_multipart(path, offset, ranges, size, mimetype, boundary)
+        headers["Content-Length"] = str(length)
+        return Response(
+            body,
+            status=206,
+            headers=headers,
+            mimetype=f"multipart/byteranges; boundary={boundary}",
+            direct_passthrough=True,
+        )
+
+    headers["Content-Length"] = str(length)
+    body = wrap_file(req.environ, _FileSlice(path, offset + start, length), BLOCK_SIZE)
+    return Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
@@ -0,0 +1,151 @@
+"""Seek-heavy playback benchmark for the song audio endpoint.
+
+Compares the previous handler (plain ``send_from_directory``) with
+``audio_serving.serve_audio_file`` on the same synthetic MP3, replaying
+what a browser <audio> element does while a user scrubs through a track:
+
+- seek:     ``Range: bytes=N-`` and read ~256 KiB before seeking again
+- replay:   revalidate the whole file with ``If-None-Match``
+- waveform: one multi-range request fetching 8 small windows
+
+For each handler it reports requests/s, MB/s and the bytes a client has to
+read. If a handler ignores a range, the client must read from offset 0 up
+to the position it wanted.
+
+Run from ``backend/``:
+
+    python bench/bench_audio_serving.py --size-mb 16 --seeks 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from flask import Flask, request, send_from_directory
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_serving import serve_audio_file  # noqa: E402
+
+SEEK_WINDOW = 256 * 1024
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + b"\x00" * 413  # 128 kbps / 44.1 kHz
+
+
+def build_app(path: Path) -> Flask:
+    app = Flask(__name__)
+
+    @app.route("/before")
+    def before():
+        return send_from_directory(
+            directory=str(path.parent), path=path.name, as_attachment=False, mimetype="audio/mpeg"
+        )
+
+    @app.route("/after")
+    def after():
+        return serve_audio_file(request, path, "audio/mpeg")
+
+    return app
+
+
+def read_upto(resp, limit: int) -> int:
+    """Consume at most ``limit`` bytes of a streamed response, then drop it."""
+
+    got = 0
+    for chunk in resp.response:
+        got += len(chunk)
+        if got >= limit:
+            break
+    resp.close()
+    return min(got, limit)
+
+
+def run(client, url: str, size: int, seeks: int, seed: int) -> Dict[str, float]:
+    rng = random.Random(seed)
+    stats = {"requests": 0, "bytes": 0, "seconds": 0.0}
+
+    def timed(fn: Callable[[], int]) -> None:
+        t0 = time.perf_counter()
+        stats["bytes"] += fn()
+        stats["seconds"] += time.perf_counter() - t0
+        stats["requests"] += 1
+
+    # Initial load, like <audio preload="auto">.
+    first = client.get(url, headers={"Range": "bytes=0-"}, buffered=False)
+    etag = first.headers.get("ETag")
+    timed(lambda: read_upto(first, size))
+
+    for _ in range(seeks):
+        pos = rng.randrange(0, size - SEEK_WINDOW)
+
+        def seek() -> int:
+            resp = client.get(url, headers={"Range": f"bytes={pos}-"}, buffered=False)
+            if resp.status_code == 206:
+                return read_upto(resp, SEEK_WINDOW)
+            # Range ignored: the client has to read up to where it wanted.
+            return read_upto(resp, pos + SEEK_WINDOW)
+
+        timed(seek)
+
+        if etag and rng.random() < 0.2:
+
+            def replay() -> int:
+                resp = client.get(url, headers={"If-None-Match": etag}, buffered=False)
+                return read_upto(resp, size)
+
+            timed(replay)
+
+    windows = sorted(rng.randrange(0, size - 4096) for _ in range(8))
+    spec = ", ".join(f"{w}-{w + 4095}" for w in windows)
+
+    def waveform() -> int:
+        resp = client.get(url, headers={"Range": f"bytes={spec}"}, buffered=False)
+        if resp.status_code == 206:
+            return read_upto(resp, size)
+        # Multi-range refused (416) or ignored (200): fall back to one
+        # request per window, as players do.
+        read_upto(resp, 0)
+        total = 0
+        for w in windows:
+            single = client.get(url, headers={"Range": f"bytes={w}-{w + 4095}"}, buffered=False)
+            total += read_upto(single, size if single.status_code == 206 else w + 4096)
+            stats["requests"] += 1
+        return total
+
+    timed(waveform)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=16.0)
+    parser.add_argument("--seeks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "song_bench.mp3"
+        frames = int(args.size_mb * 1024 * 1024) // len(MP3_FRAME)
+        with open(path, "wb") as f:
+            for _ in range(frames):
+                f.write(MP3_FRAME)
+        size = path.stat().st_size
+
+        client = build_app(path).test_client()
+        print(f"file: {size / 1e6:.1f} MB, seeks: {args.seeks}")
+        print(f"{'handler':<8} {'requests':>9} {'req/s':>9} {'MB/s':>9} {'MB read':>9}")
+        for name in ("before", "after"):
+            s = run(client, f"/{name}", size, args.seeks, args.seed)
+            print(
+                f"{name:<8} {s['requests']:>9} {s['requests'] / s['seconds']:>9.0f} "
+                f"{s['bytes'] / 1e6 / s['seconds']:>9.0f} {s['bytes'] / 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
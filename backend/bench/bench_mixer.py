@@ -0,0 +1,84 @@
+"""Throughput benchmark for the block-streaming mixer.
+
+Feeds synthetic 16-bit mono vocals (in odd-sized chunks, like a network
+stream) through ``pcm_blocks`` -> ``mix_blocks`` with a generated backing
+track and encodes the result to 16-bit PCM, discarding the output. Reports
+speed as a multiple of real time and peak RSS, which should stay flat as
+``--minutes`` grows.
+
+Run from ``backend/``:
+
+    python bench/bench_mixer.py --minutes 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mixer import SAMPLE_RATE, BackingTrack, Mixer, mix_blocks, pcm_blocks, to_pcm16  # noqa: E402
+
+CHUNK_BYTES = 4001  # deliberately not a multiple of the sample size
+
+
+def fake_vocals(seconds: float, seed: int) -> Iterator[bytes]:
+    """Syllable-like bursts of a modulated tone, produced one chunk at a time."""
+
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE) * 2
+    pos = 0
+    leftover = b""
+    while pos < total:
+        n = 16384
+        t = np.arange(pos // 2, pos // 2 + n) / SAMPLE_RATE
+        env = (np.sin(2 * np.pi * 3.0 * t) > 0.2).astype(np.float32)
+        tone = np.sin(2 * np.pi * (200 + 30 * np.sin(2 * np.pi * 5 * t)) * t)
+        noise = rng.standard_normal(n) * 0.02
+        data = leftover + ((tone * env * 0.4 + noise) * 32767).astype("<i2").tobytes()
+        pos += n * 2
+        if pos > total:
+            data = data[: len(data) - (pos - total)]
+        while len(data) >= CHUNK_BYTES:
+            yield data[:CHUNK_BYTES]
+            data = data[CHUNK_BYTES:]
+        leftover = data
+    if leftover:
+        yield leftover
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--tempo", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    seconds = args.minutes * 60
+    backing = BackingTrack(args.tempo, "pop", "happy", seed=args.seed)
+    blocks = mix_blocks(pcm_blocks(fake_vocals(seconds, args.seed)), backing, Mixer())
+
+    frames = 0
+    out_bytes = 0
+    t0 = time.perf_counter()
+    for block in blocks:
+        out_bytes += len(to_pcm16(block))
+        frames += len(block)
+    elapsed = time.perf_counter() - t0
+
+    audio_seconds = frames / SAMPLE_RATE
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"audio: {audio_seconds:.1f} s stereo, output {out_bytes / 1e6:.1f} MB")
+    print(f"mixed in {elapsed:.2f} s -> {audio_seconds / elapsed:.0f}x real time (single thread)")
+    print(f"peak RSS: {peak_rss_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Open-loop load test for the song API, with ElevenLabs stubbed out.
+
+Starts the Flask app on a local threaded server in a temporary
+``GENERATED_DIR``, installs ``stub_elevenlabs.StubElevenLabs`` as the
+upstream client, and then fires a weighted mix of
+
+- ``POST /api/generate-song``        new lyrics (or, with ``--reuse``, a repeat)
+- ``GET  /api/songs/<id>/audio``     full download of an existing song
+- ``POST /api/songs/<id>/improve``   one-line lyric edit of an existing song
+
+at a fixed target rate. Requests are scheduled on the clock, not after the
+previous one returns, and latency is measured from the scheduled send time,
+so a slow server shows up as latency instead of quietly lowering the rate.
+
+Reports achieved throughput, p50/p95/p99 latency and error rate per
+endpoint, followed by the mean of each ``/api/metrics`` stage. Pass
+``--url`` to drive an already running server instead (its upstream is then
+whatever that server uses).
+
+Run from ``backend/``:
+
+    python bench/load_test.py --rate 20 --duration 30 --ttfb 0.3 --error-rate 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from stub_elevenlabs import StubElevenLabs  # noqa: E402
+
+WORDS = (
+    "light night dream fire heart city rain river open road slow fast gold "
+    "sky falling rising shadow echo home away tonight forever again alone"
+).split()
+
+
+def random_lyrics(rng: random.Random, verses: int, lines: int) -> str:
+    return "\n\n".join(
+        "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 8))) for _ in range(lines))
+        for _ in range(verses)
+    )
+
+
+def edit_one_line(rng: random.Random, lyrics: str) -> str:
+    lines = lyrics.split("\n")
+    candidates = [i for i, line in enumerate(lines) if line.strip()]
+    i = rng.choice(candidates)
+    lines[i] = f"{lines[i]} {rng.choice(WORDS)}"
+    return "\n".join(lines)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+
+    if not values:
+        return float("nan")
+    rank = max(1, min(len(values), math.ceil(q / 100.0 * len(values))))
+    return values[rank - 1]
+
+
+class Client:
+    def __init__(self, base_url: str, timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: Dict[str, Any] | None = None) -> Tuple[int, bytes]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+
+
+class LoadTest:
+    """Pool of known songs plus per-endpoint latency/error bookkeeping."""
+
+    def __init__(self, client: Client, args: argparse.Namespace) -> None:
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.songs: Dict[str, str] = {}  # song id -> current lyrics
+        self.recent_lyrics: List[str] = []
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {"generate": [], "audio": [], "improve": []}
+        self.errors: Dict[str, int] = {name: 0 for name in self.latencies}
+
+    # -- operations (return True on success) ---------------------------------
+
+    def generate(self) -> bool:
+        with self.lock:
+            reuse = self.recent_lyrics and self.rng.random() < self.args.reuse
+            lyrics = (
+                self.rng.choice(self.recent_lyrics)
+                if reuse
+                else random_lyrics(self.rng, self.args.verses, self.args.lines)
+            )
+        status, body = self.client.request(
+            "POST", "/api/generate-song", {"lyrics": lyrics, "voiceId": self.args.voice_id}
+        )
+        if status != 201:
+            return False
+        song_id = json.loads(body)["id"]
+        with self.lock:
+            self.songs[song_id] = lyrics
+            self.recent_lyrics = (self.recent_lyrics + [lyrics])[-50:]
+        return True
+
+    def _pick_song(self) -> Tuple[str, str] | None:
+        with self.lock:
+            if not self.songs:
+                return None
+            song_id = self.rng.choice(list(self.songs))
+            return song_id, self.songs[song_id]
+
+    def audio(self) -> bool:
+        picked = self._pick_song()
+        if picked is None:
+            return self.generate()
+        status, _ = self.client.request("GET", f"/api/songs/{picked[0]}/audio")
+        return status == 200
+
+    def improve(self) -> bool:
+        picked = self._pick_song()
+        if picked is None:
+            return self.generate()
+        song_id, lyrics = picked
+        with self.lock:
+            new_lyrics = edit_one_line(self.rng, lyrics)
+        status, _ = self.client.request(
+            "POST", f"/api/songs/{song_id}/improve", {"lyrics": new_lyrics, "feedback": "load test"}
+        )
+        if status != 200:
+            return False
+        with self.lock:
+            self.songs[song_id] = new_lyrics
+        return True
+
+    # -- driver --------------------------------------------------------------
+
+    def _run_one(self, name: str, scheduled: float) -> None:
+        try:
+            ok = getattr(self, name)()
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - scheduled
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+    def run(self, mix: Dict[str, float]) -> float:
+        names = list(mix)
+        weights = [mix[n] for n in names]
+        total = int(self.args.rate * self.args.duration)
+        interval = 1.0 / self.args.rate
+
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            start = time.perf_counter()
+            for i in range(total):
+                scheduled = start + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                name = self.rng.choices(names, weights)[0]
+                pool.submit(self._run_one, name, scheduled)
+        return time.perf_counter() - start
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("generate", "audio", "improve"):
+            raise SystemExit(f"unknown operation in --mix: {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def stage_means(metrics_text: str) -> Dict[str, Tuple[float, int]]:
+    sums: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for line in metrics_text.splitlines():
+        m = re.match(r'songs_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)', line)
+        if not m:
+            continue
+        kind, stage, value = m.groups()
+        if kind == "sum":
+            sums[stage] = float(value)
+        else:
+            counts[stage] = int(float(value))
+    return {
+        stage: (sums.get(stage, 0.0) / count if count else 0.0, count)
+        for stage, count in counts.items()
+    }
+
+
+def start_local_server(args: argparse.Namespace, tmp: str) -> Tuple[str, Any, StubElevenLabs]:
+    os.environ["GENERATED_DIR"] = tmp
+    os.environ.setdefault("ELEVENLABS_VOICE_ID", args.voice_id)
+
+    import app as app_module  # noqa: E402 - needs GENERATED_DIR set first
+    from werkzeug.serving import make_server
+
+    stub = StubElevenLabs(
+        ttfb=args.ttfb,
+        chunk_size=args.chunk_size,
+        realtime=args.realtime,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    app_module.eleven_client = stub
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server, stub
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=5.0, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--mix", default="generate=2,audio=6,improve=2")
+    parser.add_argument("--concurrency", type=int, default=64, help="max requests in flight")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed-songs", type=int, default=5, help="songs generated before the clock starts")
+    parser.add_argument("--verses", type=int, default=3)
+    parser.add_argument("--lines", type=int, default=4)
+    parser.add_argument("--reuse", type=float, default=0.0, help="fraction of generates that repeat lyrics")
+    parser.add_argument("--voice-id", default="bench-voice")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="drive this server instead of starting a stubbed one")
+    stub_opts = parser.add_argument_group("stub upstream (ignored with --url)")
+    stub_opts.add_argument("--ttfb", type=float, default=0.25)
+    stub_opts.add_argument("--chunk-size", type=int, default=4096)
+    stub_opts.add_argument("--realtime", type=float, default=20.0)
+    stub_opts.add_argument("--jitter", type=float, default=0.2)
+    stub_opts.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = stub = None
+        if args.url:
+            base_url = args.url
+        else:
+            base_url, server, stub = start_local_server(args, tmp)
+
+        test = LoadTest(Client(base_url, args.timeout), args)
+        for _ in range(args.seed_songs):
+            test.generate()
+        for name in test.latencies:
+            test.latencies[name].clear()
+            test.errors[name] = 0
+
+        elapsed = test.run(mix)
+        _, metrics_text = test.client.request("GET", "/api/metrics")
+        if server is not None:
+            server.shutdown()
+
+    print(f"target {args.rate:g} req/s for {args.duration:g} s, mix {args.mix}")
+    if stub is not None:
+        print(
+            f"stub: ttfb {args.ttfb:g} s, chunk {args.chunk_size} B, realtime x{args.realtime:g}, "
+            f"jitter {args.jitter:g}, error rate {args.error_rate:g} -> {stub.calls} calls, {stub.errors} failed"
+        )
+    print(f"{'endpoint':<10} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    everything: List[float] = []
+    failed = 0
+    for name, values in test.latencies.items():
+        if not values:
+            continue
+        everything.extend(values)
+        failed += test.errors[name]
+        _print_row(name, sorted(values), test.errors[name], elapsed)
+    _print_row("total", sorted(everything), failed, elapsed)
+
+    means = stage_means(metrics_text.decode("utf-8", "replace"))
+    if means:
+        print(f"\n{'stage':<16} {'count':>7} {'mean ms':>9}")
+        for stage, (mean, count) in means.items():
+            print(f"{stage:<16} {count:>7} {mean * 1000:>9.2f}")
+
+
+def _print_row(name: str, values: List[float], errors: int, elapsed: float) -> None:
+    print(
+        f"{name:<10} {len(values):>9} {len(values) / elapsed:>8.1f} "
+        f"{percentile(values, 50) * 1000:>9.1f} {percentile(values, 95) * 1000:>9.1f} "
+        f"{percentile(values, 99) * 1000:>9.1f} {errors / len(values):>7.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Offline stand-in for the ElevenLabs client used by the benchmarks.
+
+``StubElevenLabs().text_to_speech.convert(...)`` has the same signature as
+the SDK call in ``app._open_tts_stream`` and yields a valid CBR MP3 stream
+(silent 128 kbps / 44.1 kHz frames, or 16-bit PCM for ``pcm_*`` formats)
+whose length follows the text, so durations, frame indexes and stitching
+behave as they do against the real API. Latency, chunking, jitter and
+failures are configurable; nothing touches the network or API quota.
+
+Install it in-process before exercising the app (``bench/load_test.py``
+does this for you):
+
+    import app
+    from stub_elevenlabs import StubElevenLabs
+    app.eleven_client = StubElevenLabs(ttfb=0.3, error_rate=0.01)
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Any, Iterator
+
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + b"\x00" * 413  # 128 kbps / 44.1 kHz
+MP3_FRAME_SECONDS = 1152 / 44100
+PCM_BYTES_PER_SECOND = 44100 * 2
+
+# Roughly how fast lyrics are sung/spoken, to size the fake audio.
+CHARS_PER_SECOND = 15.0
+
+
+class StubUpstreamError(RuntimeError):
+    """A simulated ElevenLabs failure (before or during the stream)."""
+
+
+class _StubTextToSpeech:
+    def __init__(self, owner: "StubElevenLabs") -> None:
+        self._owner = owner
+
+    def convert(
+        self, voice_id: str, model_id: str, text: str, output_format: str, **kwargs: Any
+    ) -> Iterator[bytes]:
+        return self._owner._stream(text, output_format)
+
+
+class StubElevenLabs:
+    """Drop-in replacement for ``elevenlabs.client.ElevenLabs``.
+
+    - ``ttfb``: seconds before the first chunk arrives
+    - ``chunk_size``: bytes per yielded chunk
+    - ``realtime``: audio seconds generated per wall second after the first
+      chunk (0 = unlimited, i.e. the rest of the stream arrives at once)
+    - ``jitter``: each wait is scaled by a uniform factor in ``1 ± jitter``
+    - ``error_rate``: probability that a call fails; half of the failures
+      happen before the first byte, half mid-stream
+    """
+
+    def __init__(
+        self,
+        ttfb: float = 0.25,
+        chunk_size: int = 4096,
+        realtime: float = 20.0,
+        jitter: float = 0.2,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.ttfb = ttfb
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.text_to_speech = _StubTextToSpeech(self)
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self) -> tuple[float, float, float]:
+        with self._lock:
+            self.calls += 1
+            return self._rng.random(), self._rng.uniform(-1.0, 1.0), self._rng.random()
+
+    def _sleep(self, seconds: float, jitter: float) -> None:
+        seconds *= 1.0 + self.jitter * jitter
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _fail(self) -> None:
+        with self._lock:
+            self.errors += 1
+        raise StubUpstreamError("simulated ElevenLabs failure")
+
+    def _stream(self, text: str, output_format: str) -> Iterator[bytes]:
+        fail_roll, jitter, fail_at = self._draw()
+        fails = fail_roll < self.error_rate
+        seconds = max(1.0, len(text) / CHARS_PER_SECOND)
+
+        if output_format.startswith("pcm"):
+            total = int(seconds * PCM_BYTES_PER_SECOND) & ~1
+            unit = b"\x00" * 2
+        else:
+            frames = int(seconds / MP3_FRAME_SECONDS)
+            total = frames * len(MP3_FRAME)
+            unit = MP3_FRAME
+        payload_per_second = total / seconds
+        chunk = self.chunk_size
+
+        self._sleep(self.ttfb, jitter)
+        if fails and fail_at < 0.5:
+            self._fail()
+
+        # Build chunks out of whole units so MP3 chunks split frames exactly
+        # like a network stream would: at arbitrary byte positions.
+        block = unit * (chunk // len(unit) + 2)
+        sent = 0
+        while sent < total:
+            n = min(chunk, total - sent)
+            offset = sent % len(unit)
+            yield block[offset : offset + n]
+            sent += n
+            if fails and sent >= total * fail_at:
+                self._fail()
+            if self.realtime > 0 and sent < total:
+                self._sleep(n / payload_per_second / self.realtime, jitter)
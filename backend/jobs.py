@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator
+
+# ----------------------------------------------------------------------------
+# Background job queue for long-running song generation
+# ----------------------------------------------------------------------------
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+TERMINAL_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+ProgressFn = Callable[[float, str], None]
+
+
+class QueueFull(Exception):
+    """Raised by :meth:`JobQueue.submit` when the queue-depth limit is hit."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("job queue is full")
+        self.retry_after = retry_after
+
+
+class Job:
+    """State of a single submitted job. Mutated only under ``JobQueue._cond``."""
+
+    def __init__(self, job_id: str, kind: str) -> None:
+        self.id = job_id
+        self.kind = kind
+        self.status = JOB_QUEUED
+        self.stage = JOB_QUEUED
+        self.progress = 0.0
+        self.result: Any = None
+        self.error: str | None = None
+        self.created_at = datetime.utcnow().isoformat()
+        self.updated_at = self.created_at
+        self.started: float | None = None
+        self.finished: float | None = None
+        # Bumped on every change so SSE listeners can tell when to emit.
+        self.revision = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+        }
+
+
+class JobQueue:
+    """Bounded thread-pool scheduler.
+
+    At most ``max_workers`` jobs run concurrently and at most ``max_queued``
+    more may wait for a worker; beyond that :meth:`submit` raises
+    :class:`QueueFull` so the HTTP layer can answer ``429`` instead of piling
+    up work. Finished jobs are retained (up to ``max_retained``) so clients
+    can still poll their status.
+    """
+
+    def __init__(
+        self, max_workers: int, max_queued: int, max_retained: int = 1000, name: str = "song-job"
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_retained = max_retained
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._cond = threading.Condition()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active = 0  # queued + running
+        # Exponential moving average of job run time, used for Retry-After.
+        self._avg_runtime = 5.0
+
+    def _touch(self, job: Job) -> None:
+        job.updated_at = datetime.utcnow().isoformat()
+        job.revision += 1
+        self._cond.notify_all()
+
+    def _prune_locked(self) -> None:
+        excess = len(self._jobs) - self.max_retained
+        if excess <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.status in TERMINAL_STATES][:excess]:
+            del self._jobs[job_id]
+
+    def _retry_after_locked(self) -> int:
+        waiting = max(self._active - self.max_workers + 1, 1)
+        return max(1, math.ceil(self._avg_runtime * waiting / self.max_workers))
+
+    def submit(self, kind: str, fn: Callable[[ProgressFn], Any]) -> Job:
+        """Schedule ``fn(progress)`` and return its :class:`Job` immediately."""
+
+        with self._cond:
+            if self._active >= self.max_workers + self.max_queued:
+                raise QueueFull(self._retry_after_locked())
+            job = Job(uuid.uuid4().hex, kind)
+            self._jobs[job.id] = job
+            self._active += 1
+            self._prune_locked()
+
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[ProgressFn], Any]) -> None:
+        def progress(fraction: float, stage: str) -> None:
+            with self._cond:
+                job.progress = min(max(fraction, job.progress), 1.0)
+                job.stage = stage
+                self._touch(job)
+
+        with self._cond:
+            job.status = JOB_RUNNING
+            job.stage = JOB_RUNNING
+            job.started = time.monotonic()
+            self._touch(job)
+
+        try:
+            result = fn(progress)
+        except Exception as exc:
+            with self._cond:
+                job.status = job.stage = JOB_FAILED
+                job.error = str(exc)
+                self._finish_locked(job)
+        else:
+            with self._cond:
+                job.status = job.stage = JOB_SUCCEEDED
+                job.progress = 1.0
+                job.result = result
+                self._finish_locked(job)
+
+    def _finish_locked(self, job: Job) -> None:
+        job.finished = time.monotonic()
+        self._active -= 1
+        if job.started is not None:
+            self._avg_runtime = 0.8 * self._avg_runtime + 0.2 * (job.finished - job.started)
+        self._touch(job)
+
+    def get(self, job_id: str) -> Job | None:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def snapshot(self, job_id: str) -> Dict[str, Any] | None:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def watch(self, job: Job, heartbeat: float = 15.0) -> Iterator[Dict[str, Any] | None]:
+        """Yield a snapshot every time ``job`` changes, until it finishes.
+
+        ``None`` is yielded when nothing changed for ``heartbeat`` seconds so
+        streaming callers can keep idle connections alive.
+        """
+
+        seen = -1
+        while True:
+            with self._cond:
+                if job.revision == seen:
+                    self._cond.wait_for(lambda: job.revision != seen, timeout=heartbeat)
+                if job.revision == seen:
+                    snapshot = None
+                else:
+                    seen = job.revision
+                    snapshot = job.to_dict()
+                done = job.status in TERMINAL_STATES
+            yield snapshot
+            if done and snapshot is not None:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "active": self._active,
+                "maxWorkers": self.max_workers,
+                "maxQueued": self.max_queued,
+                "retained": len(self._jobs),
+            }
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# ----------------------------------------------------------------------------
+# Per-stage latency histograms, rendered in Prometheus text format
+# ----------------------------------------------------------------------------
+
+# Stages of the generate / improve request path, in the order they happen.
+STAGE_REQUEST_PARSE = "request_parse"
+STAGE_UPSTREAM_TTFB = "upstream_ttfb"
+STAGE_UPSTREAM_TOTAL = "upstream_total"
+STAGE_DISK_WRITE = "disk_write"
+STAGE_STORE_UPDATE = "store_update"
+
+STAGES = (
+    STAGE_REQUEST_PARSE,
+    STAGE_UPSTREAM_TTFB,
+    STAGE_UPSTREAM_TOTAL,
+    STAGE_DISK_WRITE,
+    STAGE_STORE_UPDATE,
+)
+
+# Seconds. Request parsing and SQLite commits land in the low buckets,
+# upstream synthesis in the high ones.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Cumulative-bucket histogram; cheap enough to observe on every request."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[slot] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """(cumulative bucket counts incl. +Inf, sum, count)."""
+
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class StageMetrics:
+    """One latency histogram per request-path stage.
+
+    Exposed as a single labelled metric, ``<name>{stage="..."}``, so
+    dashboards can stack the stages of a request against each other.
+    """
+
+    def __init__(
+        self,
+        name: str = "songs_stage_seconds",
+        stages: Iterable[str] = STAGES,
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self._histograms: Dict[str, Histogram] = {stage: Histogram(buckets) for stage in stages}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self._histograms[stage].observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Observe the wall time of the ``with`` body, even if it raises."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} Time spent in each stage of the song request path.",
+            f"# TYPE {self.name} histogram",
+        ]
+        for stage, hist in self._histograms.items():
+            cumulative, total, count = hist.snapshot()
+            for bound, n in zip(hist.buckets, cumulative):
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="{bound:g}"}} {n}')
+            lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{self.name}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def render_gauges(prefix: str, values: Dict[str, float], help_text: str) -> str:
+    """Render numeric fields of a stats dict (e.g. ``TTS_CACHE.stats()``) as gauges."""
+
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{_snake_case(key)}"
+        lines.append(f"# HELP {name} {help_text} ({key}).")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _snake_case(name: str) -> str:
+    out = []
+    for ch in name:
+        if ch.isupper():
+            out.append("_")
+            out.append(ch.lower())
+        elif ch.isalnum():
+            out.append(ch)
+        else:
+            out.append("_")
+    return "".join(out).strip("_")
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import struct
+import wave
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+# ----------------------------------------------------------------------------
+# Block-streaming vocals + instrumental mixer
+# ----------------------------------------------------------------------------
+#
+# Everything works on fixed-size blocks of BLOCK_FRAMES samples, so memory use
+# is constant no matter how long the song is. Vocals arrive as 16-bit mono PCM
+# (ElevenLabs `pcm_44100`); the instrumental is either an uploaded 16-bit WAV
+# or rendered on the fly by BackingTrack. Output is 16-bit stereo.
+
+SAMPLE_RATE = 44100
+BLOCK_FRAMES = 4096
+CHANNELS = 2
+
+
+class MixError(ValueError):
+    """Raised for inputs the mixer cannot handle (e.g. unsupported WAV)."""
+
+
+# -- inputs ------------------------------------------------------------------
+
+
+def pcm_blocks(chunks: Iterable[bytes], block_frames: int = BLOCK_FRAMES) -> Iterator[np.ndarray]:
+    """Re-block a stream of s16le mono byte chunks into float32 arrays.
+
+    Chunk boundaries from the network are arbitrary (and may split a sample),
+    so bytes are accumulated until a whole block is available. The final
+    block may be shorter.
+    """
+
+    block_bytes = block_frames * 2
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        while len(buf) >= block_bytes:
+            block = np.frombuffer(bytes(buf[:block_bytes]), dtype="<i2")
+            del buf[:block_bytes]
+            yield block.astype(np.float32) / 32768.0
+    usable = len(buf) - len(buf) % 2
+    if usable:
+        yield np.frombuffer(bytes(buf[:usable]), dtype="<i2").astype(np.float32) / 32768.0
+
+
+def file_chunks(path: Path, size: int = 64 * 1024) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(size), b"")
+
+
+class WavInstrumental:
+    """Block reader for an uploaded 16-bit PCM WAV at SAMPLE_RATE."""
+
+    def __init__(self, path: Path) -> None:
+        try:
+            self._wav = wave.open(str(path), "rb")
+        except (wave.Error, EOFError) as exc:
+            raise MixError(f"instrumental is not a readable WAV file: {exc}") from exc
+        if self._wav.getsampwidth() != 2:
+            self._wav.close()
+            raise MixError("instrumental WAV must be 16-bit PCM")
+        if self._wav.getframerate() != SAMPLE_RATE:
+            self._wav.close()
+            raise MixError(f"instrumental WAV must be {SAMPLE_RATE} Hz")
+        if self._wav.getnchannels() not in (1, 2):
+            self._wav.close()
+            raise MixError("instrumental WAV must be mono or stereo")
+        self._channels = self._wav.getnchannels()
+
+    def render(self, n: int) -> np.ndarray | None:
+        """Next ``n`` frames as float32 stereo, zero-padded; None at the end."""
+
+        raw = self._wav.readframes(n)
+        if not raw:
+            return None
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+        data = data.reshape(-1, self._channels)
+        if self._channels == 1:
+            data = np.repeat(data, 2, axis=1)
+        if len(data) < n:
+            data = np.vstack([data, np.zeros((n - len(data), 2), dtype=np.float32)])
+        return data
+
+    def close(self) -> None:
+        self._wav.close()
+
+
+# Per-genre instrument levels: kick, hi-hat, bass, pad.
+_GENRE_LEVELS = {
+    "pop": (0.55, 0.12, 0.30, 0.18),
+    "rock": (0.65, 0.18, 0.35, 0.12),
+    "hip-hop": (0.75, 0.15, 0.40, 0.10),
+    "electronic": (0.70, 0.20, 0.35, 0.20),
+    "jazz": (0.30, 0.10, 0.30, 0.25),
+    "acoustic": (0.25, 0.06, 0.20, 0.30),
+}
+_DEFAULT_LEVELS = _GENRE_LEVELS["pop"]
+
+# Chord roots in semitones above A2 (110 Hz) and chord quality per bar.
+_MAJOR = (0, 4, 7)
+_MINOR = (0, 3, 7)
+_PROGRESSIONS = {
+    "happy": ((3, _MAJOR), (10, _MAJOR), (0, _MINOR), (8, _MAJOR)),  # I-V-vi-IV in C
+    "energetic": ((3, _MAJOR), (8, _MAJOR), (10, _MAJOR), (3, _MAJOR)),
+    "sad": ((0, _MINOR), (8, _MAJOR), (3, _MAJOR), (10, _MAJOR)),  # vi-IV-I-V in C
+    "calm": ((3, _MAJOR), (0, _MINOR), (8, _MAJOR), (10, _MAJOR)),
+    "dark": ((0, _MINOR), (5, _MINOR), (8, _MAJOR), (7, _MAJOR)),
+}
+_DEFAULT_PROGRESSION = _PROGRESSIONS["happy"]
+
+
+class BackingTrack:
+    """Procedural, tempo-synced backing: kick, off-beat hats, bass and pad.
+
+    Each block is computed from its absolute sample position with a handful
+    of vectorised NumPy ops, so nothing is precomputed for the whole song and
+    memory does not grow with its length.
+    """
+
+    def __init__(self, bpm: float | None, genre: str | None, mood: str | None, seed: int = 0) -> None:
+        self.bpm = float(bpm) if bpm else 100.0
+        self.bpm = min(max(self.bpm, 40.0), 220.0)
+        self.beat = SAMPLE_RATE * 60.0 / self.bpm  # samples per beat
+        self.levels = _GENRE_LEVELS.get((genre or "").lower(), _DEFAULT_LEVELS)
+        self.progression = _PROGRESSIONS.get((mood or "").lower(), _DEFAULT_PROGRESSION)
+        self._rng = np.random.default_rng(seed)
+        self._pos = 0
+
+    def render(self, n: int) -> np.ndarray:
+        kick_lvl, hat_lvl, bass_lvl, pad_lvl = self.levels
+        idx = np.arange(self._pos, self._pos + n, dtype=np.float64)
+        self._pos += n
+        t = idx / SAMPLE_RATE
+
+        beat_pos = idx / self.beat
+        in_beat = (beat_pos % 1.0) * self.beat / SAMPLE_RATE  # seconds since beat
+        in_half = ((beat_pos + 0.5) % 1.0) * self.beat / SAMPLE_RATE  # since off-beat
+
+        # Kick: pitch-dropping sine with fast exponential decay.
+        kick = np.sin(2 * np.pi * (50.0 * in_beat + 60.0 * (1 - np.exp(-in_beat * 30.0)) / 30.0))
+        kick *= np.exp(-in_beat * 12.0)
+
+        # Hats: white noise bursts on the off-beats.
+        hat = self._rng.standard_normal(n) * np.exp(-in_half * 60.0)
+
+        # Harmony: one chord per bar (4 beats).
+        bar = (beat_pos // 4).astype(np.int64) % len(self.progression)
+        roots = np.array([r for r, _ in self.progression], dtype=np.float64)
+        thirds = np.array([q[1] for _, q in self.progression], dtype=np.float64)
+        root_semis = roots[bar]
+        bass_f = 110.0 * 2 ** ((root_semis - 12) / 12)
+        bass = np.sin(2 * np.pi * bass_f * t) * (0.6 + 0.4 * np.exp(-in_beat * 4.0))
+
+        pad = np.zeros(n)
+        for semis in (root_semis, root_semis + thirds[bar], root_semis + 7):
+            pad += np.sin(2 * np.pi * 220.0 * 2 ** (semis / 12) * t)
+        pad /= 3.0
+
+        mono = kick_lvl * kick + bass_lvl * bass
+        # Hats and pad are panned slightly apart for width.
+        left = mono + hat_lvl * 0.8 * hat + pad_lvl * pad * 1.1
+        right = mono + hat_lvl * 1.2 * hat + pad_lvl * pad * 0.9
+        return np.stack([left, right], axis=1).astype(np.float32)
+
+
+# -- processing --------------------------------------------------------------
+
+
+class Mixer:
+    """Gain, sidechain ducking and peak limiting over fixed-size blocks.
+
+    Gains change once per block; within a block they are ramped linearly
+    from the previous value to avoid zipper noise. The limiter looks at the
+    block peak before applying its gain, so its output never exceeds
+    ``ceiling`` (a final hard clip guards against rounding).
+    """
+
+    def __init__(
+        self,
+        vocal_gain: float = 1.0,
+        instrumental_gain: float = 0.6,
+        duck_depth: float = 0.5,
+        duck_threshold: float = 0.05,
+        ceiling: float = 0.97,
+        release: float = 0.2,
+    ) -> None:
+        self.vocal_gain = vocal_gain
+        self.instrumental_gain = instrumental_gain
+        self.duck_depth = duck_depth
+        self.duck_threshold = duck_threshold
+        self.ceiling = ceiling
+        # Per-block smoothing coefficient for gains recovering towards 1.
+        self.release = release
+        self._duck = 1.0
+        self._limit = 1.0
+
+    @staticmethod
+    def _ramp(start: float, stop: float, n: int) -> np.ndarray:
+        return np.linspace(start, stop, n, endpoint=False, dtype=np.float32)[:, None]
+
+    def process(self, vocals: np.ndarray, instrumental: np.ndarray) -> np.ndarray:
+        """Mix one block: ``vocals`` is (n,) mono, ``instrumental`` (n, 2)."""
+
+        n = len(instrumental)
+
+        # Sidechain: duck the instrumental while the vocal is active. Attack
+        # is immediate, release is smoothed across blocks.
+        rms = float(np.sqrt(np.mean(vocals * vocals))) if len(vocals) else 0.0
+        target = 1.0 - self.duck_depth * min(rms / self.duck_threshold, 1.0)
+        duck = target if target < self._duck else self._duck + (target - self._duck) * self.release
+        inst = instrumental * (self.instrumental_gain * self._ramp(self._duck, duck, n))
+        self._duck = duck
+
+        mixed = inst
+        if len(vocals):
+            mixed[: len(vocals)] += (vocals * self.vocal_gain)[:, None]
+
+        # Peak limiter.
+        peak = float(np.max(np.abs(mixed))) if n else 0.0
+        target = min(1.0, self.ceiling / peak) if peak > 0 else 1.0
+        limit = target if target < self._limit else self._limit + (target - self._limit) * self.release
+        mixed *= self._ramp(min(self._limit, limit), limit, n)
+        self._limit = limit
+
+        np.clip(mixed, -self.ceiling, self.ceiling, out=mixed)
+        return mixed
+
+
+def mix_blocks(
+    vocals: Iterator[np.ndarray],
+    instrumental: BackingTrack | WavInstrumental,
+    mixer: Mixer | None = None,
+    tail_seconds: float = 2.0,
+) -> Iterator[np.ndarray]:
+    """Yield mixed (n, 2) float32 blocks until both inputs are exhausted.
+
+    A generated backing track has no natural end, so it runs for
+    ``tail_seconds`` after the vocals finish, fading out.
+    """
+
+    mixer = mixer or Mixer()
+    generated = isinstance(instrumental, BackingTrack)
+
+    for vocal in vocals:
+        inst = instrumental.render(len(vocal))
+        if inst is None:
+            inst = np.zeros((len(vocal), 2), dtype=np.float32)
+        yield mixer.process(vocal, inst)
+
+    silence = np.zeros(0, dtype=np.float32)
+    if generated:
+        tail = int(tail_seconds * SAMPLE_RATE)
+        done = 0
+        while done < tail:
+            n = min(BLOCK_FRAMES, tail - done)
+            fade = np.linspace(1 - done / tail, 1 - (done + n) / tail, n, endpoint=False, dtype=np.float32)
+            yield mixer.process(silence, instrumental.render(n) * fade[:, None])
+            done += n
+    else:
+        while True:
+            inst = instrumental.render(BLOCK_FRAMES)
+            if inst is None:
+                break
+            yield mixer.process(silence, inst)
+
+
+def to_pcm16(block: np.ndarray) -> bytes:
+    return (block * 32767.0).astype("<i2").tobytes()
+
+
+def write_wav(blocks: Iterable[np.ndarray], path: Path) -> int:
+    """Write blocks to a 16-bit stereo WAV; returns the number of frames."""
+
+    frames = 0
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(CHANNELS)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        for block in blocks:
+            out.writeframesraw(to_pcm16(block))
+            frames += len(block)
+    return frames
+
+
+def streaming_wav_header() -> bytes:
+    """WAV header for a stream whose length is not known up front.
+
+    The RIFF/data sizes are set to the maximum; players read until EOF.
+    """
+
+    byte_rate = SAMPLE_RATE * CHANNELS * 2
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, CHANNELS, SAMPLE_RATE, byte_rate, CHANNELS * 2, 16)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF - 36)
+    )
+
+
+def tee_wav(blocks: Iterable[np.ndarray], path: Path) -> Iterator[bytes]:
+    """Stream blocks as WAV bytes while also writing them to ``path``."""
+
+    yield streaming_wav_header()
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(CHANNELS)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        for block in blocks:
+            pcm = to_pcm16(block)
+            out.writeframesraw(pcm)
+            yield pcm
+
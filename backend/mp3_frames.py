@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, NamedTuple, Tuple
+
+# ----------------------------------------------------------------------------
+# Minimal MPEG audio frame parsing (no decoding)
+# ----------------------------------------------------------------------------
+
+# Bitrates in kbps indexed by [version_key][layer][bitrate_index]; version_key
+# is 1 for MPEG-1 and 2 for MPEG-2 / MPEG-2.5.
+_BITRATES = {
+    1: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    2: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+
+# Sample rates indexed by the 2-bit version id (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1).
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+HEADER_SIZE = 4
+ID3V2_HEADER_SIZE = 10
+
+
+class FrameHeader(NamedTuple):
+    length: int  # bytes, including the 4-byte header
+    samples: int  # PCM samples per channel in this frame
+    sample_rate: int
+
+
+class Frame(NamedTuple):
+    offset: int  # byte offset of the frame in the scanned stream
+    length: int
+    samples: int
+    sample_rate: int
+    is_info: bool  # Xing/Info/VBRI metadata frame rather than audio
+
+
+def parse_header(header: bytes) -> FrameHeader | None:
+    """Decode a 4-byte MPEG audio frame header, or return None if invalid."""
+
+    if len(header) < HEADER_SIZE or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version_id = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    if version_id == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    version_key = 1 if version_id == 3 else 2
+    bitrate = _BITRATES[version_key][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_id][sample_rate_index]
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or version_key == 1:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+
+    return FrameHeader(length, samples, sample_rate)
+
+
+def _is_info_frame(frame: bytes) -> bool:
+    # The Xing/Info/VBRI tag sits right after the side information, whose size
+    # depends on version and channel mode; it is always within the first 40
+    # bytes, and those bytes are never otherwise ASCII tags in audio frames.
+    head = frame[:40]
+    return b"Xing" in head or b"Info" in head or b"VBRI" in head
+
+
+class FrameScanner:
+    """Incrementally find MPEG audio frames in a byte stream.
+
+    Feed it chunks in order (e.g. straight from the ElevenLabs iterator) and
+    it yields each complete :class:`Frame` as soon as all of its bytes have
+    arrived. Only the tail of an incomplete frame is buffered, so memory use
+    is independent of the stream length. A leading ID3v2 tag and any garbage
+    between frames (such as a trailing ID3v1 tag) are skipped.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+        self._buf_offset = 0  # stream offset of self._buf[0]
+        self._skip = 0  # bytes still to discard (ID3v2 body)
+        self._started = False
+        self._first_frame = True
+
+    def feed(self, chunk: bytes) -> Iterator[Frame]:
+        self._buf += chunk
+        pos = 0
+        buf = self._buf
+
+        if self._skip:
+            step = min(self._skip, len(buf))
+            pos += step
+            self._skip -= step
+
+        if not self._started and not self._skip:
+            if len(buf) - pos < ID3V2_HEADER_SIZE:
+                self._consume(pos)
+                return
+            self._started = True
+            if buf[pos:pos + 3] == b"ID3":
+                size = (
+                    (buf[pos + 6] & 0x7F) << 21
+                    | (buf[pos + 7] & 0x7F) << 14
+                    | (buf[pos + 8] & 0x7F) << 7
+                    | (buf[pos + 9] & 0x7F)
+                )
+                total = ID3V2_HEADER_SIZE + size
+                step = min(total, len(buf) - pos)
+                pos += step
+                self._skip = total - step
+
+        while not self._skip and len(buf) - pos >= HEADER_SIZE:
+            header = parse_header(bytes(buf[pos:pos + HEADER_SIZE]))
+            if header is None:
+                pos += 1
+                continue
+            if len(buf) - pos < header.length:
+                break
+            is_info = self._first_frame and _is_info_frame(bytes(buf[pos:pos + header.length]))
+            self._first_frame = False
+            yield Frame(
+                self._buf_offset + pos, header.length, header.samples, header.sample_rate, is_info
+            )
+            pos += header.length
+
+        self._consume(pos)
+
+    def _consume(self, n: int) -> None:
+        if n:
+            del self._buf[:n]
+            self._buf_offset += n
+
+
+def iter_file_frames(path: Path, block_size: int = 64 * 1024) -> Iterator[Frame]:
+    """Scan an MP3 file on disk block by block."""
+
+    scanner = FrameScanner()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            yield from scanner.feed(block)
+
+
+# ----------------------------------------------------------------------------
+# Frame index sidecar (`<audio>.idx`)
+# ----------------------------------------------------------------------------
+#
+# Layout: a 40-byte header (magic, sample rate, frame count, total samples,
+# size of the indexed audio file) followed by one (byte offset, first sample) pair of native uint64 per audio
+# frame. The pairs are sorted on both fields, so a timestamp lookup is a
+# binary search over an mmap of the file.
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"MP3IDX1\0"
+_INDEX_HEADER = struct.Struct("<8sIIQQQ")  # magic, sample_rate, reserved, frames, samples, audio bytes
+_INDEX_BATCH = 4096  # frames buffered before each write
+
+
+def index_path_for(audio_path: Path) -> Path:
+    return audio_path.with_name(audio_path.name + INDEX_SUFFIX)
+
+
+class FrameIndexBuilder:
+    """Build a sidecar index from the same chunks that are written to disk.
+
+    Call :meth:`feed` with every chunk of the MP3 byte stream in order, then
+    :meth:`close` - or :meth:`abort` if the stream failed. Memory use is one
+    scanner buffer plus a small batch of records, however long the audio is.
+    """
+
+    def __init__(self, index_path: Path) -> None:
+        self.index_path = index_path
+        self._scanner = FrameScanner()
+        # Written under a temporary name and renamed on close, so readers
+        # never see a half-written index.
+        # The pid matters: forked workers reuse the same thread idents.
+        self._tmp_path = index_path.with_name(
+            f".{index_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        self._fh = open(self._tmp_path, "wb")
+        self._fh.write(_INDEX_HEADER.pack(INDEX_MAGIC, 0, 0, 0, 0, 0))
+        self._batch = array("Q")
+        # Size of the indexed file; lets readers detect a stale sidecar.
+        self.audio_bytes = 0
+        self.frames = 0
+        self.total_samples = 0
+        self.sample_rate = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.audio_bytes += len(chunk)
+        for frame in self._scanner.feed(chunk):
+            self.add(frame.offset, frame)
+
+    def add(self, offset: int, frame: Frame) -> None:
+        """Record ``frame`` at ``offset`` in the indexed file."""
+
+        if frame.is_info:
+            return
+        if not self.sample_rate:
+            self.sample_rate = frame.sample_rate
+        self._batch.append(offset)
+        self._batch.append(self.total_samples)
+        self.frames += 1
+        self.total_samples += frame.samples
+        if len(self._batch) >= 2 * _INDEX_BATCH:
+            self._batch.tofile(self._fh)
+            del self._batch[:]
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        self._batch.tofile(self._fh)
+        self._fh.seek(0)
+        self._fh.write(
+            _INDEX_HEADER.pack(
+                INDEX_MAGIC, self.sample_rate, 0, self.frames, self.total_samples, self.audio_bytes
+            )
+        )
+        self._fh.close()
+        os.replace(self._tmp_path, self.index_path)
+
+    def abort(self) -> None:
+        """Discard the partial index; a no-op once :meth:`close` has run."""
+
+        if self._fh.closed:
+            return
+        self._fh.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "FrameIndexBuilder":
+        return self
+
+    def __exit__(self, exc_type: object, *exc_info: object) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class IndexedMP3Writer:
+    """File-like writer that indexes MP3 frames as the bytes go to disk."""
+
+    def __init__(self, path: Path) -> None:
+        self._fh: IO[bytes] = open(path, "wb")
+        self._index = FrameIndexBuilder(index_path_for(path))
+
+    def write(self, chunk: bytes) -> None:
+        self._fh.write(chunk)
+        self._index.feed(chunk)
+
+    def close(self) -> None:
+        self._fh.close()
+        self._index.close()
+
+    def abort(self) -> None:
+        self._fh.close()
+        self._index.abort()
+
+    def __enter__(self) -> "IndexedMP3Writer":
+        return self
+
+    def __exit__(self, exc_type: object, *exc_info: object) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class FrameIndex:
+    """Read-only, mmap-backed view of a sidecar index."""
+
+    def __init__(self, index_path: Path) -> None:
+        with open(index_path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _INDEX_HEADER.size:
+            self._mm.close()
+            raise ValueError(f"{index_path} is truncated")
+        (
+            magic,
+            self.sample_rate,
+            _,
+            self.frames,
+            self.total_samples,
+            self.audio_bytes,
+        ) = _INDEX_HEADER.unpack_from(self._mm)
+        if magic != INDEX_MAGIC:
+            self._mm.close()
+            raise ValueError(f"{index_path} is not a frame index")
+        self._records = memoryview(self._mm)[_INDEX_HEADER.size:].cast("Q")
+
+    @property
+    def duration(self) -> float:
+        """Exact playback length in seconds."""
+
+        return self.total_samples / self.sample_rate if self.sample_rate else 0.0
+
+    def locate(self, seconds: float) -> Tuple[int, float]:
+        """Return ``(byte offset, start time)`` of the frame playing at ``seconds``.
+
+        O(log n) binary search; only the touched pages of the sidecar are read.
+        """
+
+        if not self.frames:
+            return 0, 0.0
+        target = int(max(seconds, 0.0) * self.sample_rate)
+        i = max(bisect_right(self._records[1::2], target) - 1, 0)
+        return self._records[2 * i], self._records[2 * i + 1] / self.sample_rate
+
+    def close(self) -> None:
+        self._records.release()
+        self._mm.close()
+
+    def __enter__(self) -> "FrameIndex":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def open_index(audio_path: Path) -> FrameIndex:
+    """Open the sidecar for ``audio_path``, (re)building it if missing or stale.
+
+    Files written through :class:`IndexedMP3Writer` already have one; this
+    fallback covers audio produced before the sidecar existed.
+    """
+
+    index_path = index_path_for(audio_path)
+    size = audio_path.stat().st_size
+    try:
+        index = FrameIndex(index_path)
+    except (FileNotFoundError, ValueError):
+        pass
+    else:
+        if index.audio_bytes == size:
+            return index
+        index.close()
+
+    with FrameIndexBuilder(index_path) as builder:
+        for frame in iter_file_frames(audio_path):
+            builder.add(frame.offset, frame)
+        builder.audio_bytes = size
+    return FrameIndex(index_path)
+
+
+def concat_mp3(inputs: Iterable[Path], output_path: Path) -> List[int]:
+    """Join MP3 files at frame boundaries without re-encoding.
+
+    Tags, Xing/Info headers (which describe the individual inputs, not the
+    result) and partial frames are dropped; every audio frame is copied
+    verbatim. All inputs are expected to share one format, which holds for
+    segments requested with the same ElevenLabs `output_format`. The frame
+    index sidecar for ``output_path`` is written in the same pass.
+
+    Returns the number of audio frames taken from each input.
+    """
+
+    counts: List[int] = []
+    with open(output_path, "wb") as out, FrameIndexBuilder(index_path_for(output_path)) as index:
+        for path in inputs:
+            n = 0
+            with open(path, "rb") as src:
+                for frame in iter_file_frames(path):
+                    if frame.is_info:
+                        continue
+                    src.seek(frame.offset)
+                    index.add(out.tell(), frame)
+                    out.write(src.read(frame.length))
+                    n += 1
+            counts.append(n)
+        index.audio_bytes = out.tell()
+    return counts
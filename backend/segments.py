@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import difflib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, TypeVar
+
+# ----------------------------------------------------------------------------
+# Splitting lyrics into independently synthesizable segments
+# ----------------------------------------------------------------------------
+
+T = TypeVar("T")
+
+
+def _verses(text: str) -> List[List[str]]:
+    """Stripped, non-empty lines grouped into verses (split on blank lines)."""
+
+    verses: List[List[str]] = []
+    verse: List[str] = []
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line:
+            verse.append(line)
+        elif verse:
+            verses.append(verse)
+            verse = []
+    if verse:
+        verses.append(verse)
+    return verses
+
+
+def _pack(lines: Sequence[str], max_chars: int) -> List[str]:
+    """Greedily pack whole lines into segments of at most ~max_chars."""
+
+    segments: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if current and size + 1 + len(line) > max_chars:
+            segments.append("\n".join(current))
+            current, size = [], 0
+        size += len(line) + (1 if current else 0)
+        current.append(line)
+    if current:
+        segments.append("\n".join(current))
+    return segments
+
+
+def split_lyrics(text: str, max_chars: int) -> List[str]:
+    """Split lyrics into verse/line-aligned segments of at most ~max_chars.
+
+    Verses (blocks separated by blank lines) are never merged, so each verse
+    starts a new segment; within a verse whole lines are packed together until
+    the next one would exceed ``max_chars``. A single line longer than the
+    limit becomes its own segment rather than being cut mid-phrase.
+    """
+
+    segments: List[str] = []
+    for verse in _verses(text):
+        segments.extend(_pack(verse, max_chars))
+    return segments
+
+
+def resplit_lyrics(text: str, previous: Sequence[str], max_chars: int) -> List[str]:
+    """Split revised lyrics, keeping ``previous`` segments wherever possible.
+
+    Plain :func:`split_lyrics` would let a one-line edit shift the packing of
+    every later line in its verse. Instead, any run of lines that exactly
+    matches a previous segment is kept as that segment, and only the lines in
+    between (the edited ones) are packed into new segments.
+    """
+
+    by_first_line: Dict[str, List[List[str]]] = {}
+    for segment in previous:
+        lines = segment.split("\n")
+        by_first_line.setdefault(lines[0], []).append(lines)
+    for candidates in by_first_line.values():
+        candidates.sort(key=len, reverse=True)
+
+    segments: List[str] = []
+    for verse in _verses(text):
+        pending: List[str] = []
+        i = 0
+        while i < len(verse):
+            match = next(
+                (c for c in by_first_line.get(verse[i], ()) if verse[i:i + len(c)] == c),
+                None,
+            )
+            if match is None:
+                pending.append(verse[i])
+                i += 1
+                continue
+            segments.extend(_pack(pending, max_chars))
+            pending = []
+            segments.append("\n".join(match))
+            i += len(match)
+        segments.extend(_pack(pending, max_chars))
+    return segments
+
+
+def count_changed_lines(old_text: str, new_text: str) -> int:
+    """Number of lines inserted, deleted or replaced between two lyric texts."""
+
+    old = [line for verse in _verses(old_text) for line in verse]
+    new = [line for verse in _verses(new_text) for line in verse]
+    changed = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag != "equal":
+            changed += max(i2 - i1, j2 - j1)
+    return changed
+
+
+def with_retries(fn: Callable[[], T], retries: int, backoff: float = 0.5) -> T:
+    """Call ``fn``, retrying up to ``retries`` extra times with linear backoff."""
+
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (attempt + 1))
+    raise AssertionError("unreachable")
+
+
+def run_segments(
+    executor: ThreadPoolExecutor,
+    segments: Sequence[str],
+    output_paths: Sequence[Path],
+    synthesize: Callable[[str, Path], T],
+    retries: int,
+    on_done: Callable[[int], None] | None = None,
+) -> List[T]:
+    """Synthesize every segment concurrently, each with its own retries.
+
+    Wall-clock time is bounded by the slowest segment rather than the sum.
+    ``on_done`` is called with the number of finished segments as they
+    complete. Results are returned in segment order; the first failure (after
+    retries) is re-raised once all segments have settled.
+    """
+
+    lock = threading.Lock()
+    done = 0
+
+    def task(segment: str, path: Path) -> T:
+        nonlocal done
+        try:
+            return with_retries(lambda: synthesize(segment, path), retries)
+        finally:
+            with lock:
+                done += 1
+                finished = done
+            if on_done is not None:
+                on_done(finished)
+
+    futures = [executor.submit(task, s, p) for s, p in zip(segments, output_paths)]
+    wait(futures)
+    return [f.result() for f in futures]
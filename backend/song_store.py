@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import base64
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# ----------------------------------------------------------------------------
+# Persistent song metadata (SQLite, WAL mode)
+# ----------------------------------------------------------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    id          TEXT PRIMARY KEY,
+    created_at  TEXT NOT NULL,
+    genre       TEXT,
+    mood        TEXT,
+    version     INTEGER NOT NULL,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS songs_created ON songs (created_at, id);
+CREATE INDEX IF NOT EXISTS songs_genre_created ON songs (genre, created_at, id);
+CREATE INDEX IF NOT EXISTS songs_mood_created ON songs (mood, created_at, id);
+
+CREATE TABLE IF NOT EXISTS song_versions (
+    song_id     TEXT NOT NULL REFERENCES songs (id) ON DELETE CASCADE,
+    version     INTEGER NOT NULL,
+    created_at  TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    PRIMARY KEY (song_id, version)
+);
+"""
+
+
+def new_song_id() -> str:
+    """Random, collision-free id that is safe to mint from any process."""
+
+    return uuid.uuid4().hex
+
+
+def _encode_cursor(created_at: str, song_id: str) -> str:
+    raw = json.dumps([created_at, song_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, song_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    return str(created_at), str(song_id)
+
+
+class SongStore:
+    """Song metadata plus full version history in a single SQLite file.
+
+    WAL mode lets any number of gunicorn workers read concurrently while one
+    writes. Each thread gets its own connection. Song dicts are stored as
+    JSON, with the columns we filter or sort on (creation time, genre, mood)
+    pulled out and indexed. ``on_write``, if given, is called with the
+    duration (lock wait included) of every write transaction.
+    """
+
+    def __init__(self, db_path: Path, on_write: Callable[[float], None] | None = None) -> None:
+        self.db_path = db_path
+        self.on_write = on_write
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock up front so concurrent writers queue
+        # on busy_timeout instead of failing on lock upgrade.
+        conn = self._conn()
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if self.on_write is not None:
+            self.on_write(time.perf_counter() - start)
+
+    # -- writes --------------------------------------------------------------
+
+    def create(self, song: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new song (``song["id"]`` must be set) as version 1."""
+
+        song.setdefault("version", 1)
+        data = json.dumps(song)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO songs (id, created_at, genre, mood, version, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (song["id"], song["timestamp"], song.get("genre"), song.get("mood"), song["version"], data),
+            )
+            conn.execute(
+                "INSERT INTO song_versions (song_id, version, created_at, data) VALUES (?, ?, ?, ?)",
+                (song["id"], song["version"], song["timestamp"], data),
+            )
+        return song
+
+    def update(self, song: Dict[str, Any]) -> Dict[str, Any]:
+        """Overwrite the current version in place (status changes and the like)."""
+
+        data = json.dumps(song)
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE songs SET genre = ?, mood = ?, data = ? WHERE id = ?",
+                (song.get("genre"), song.get("mood"), data, song["id"]),
+            )
+            conn.execute(
+                "UPDATE song_versions SET data = ? WHERE song_id = ? AND version = ?",
+                (data, song["id"], song["version"]),
+            )
+        return song
+
+    def set_fields(self, song_id: str, version: int, fields: Dict[str, Any]) -> Dict[str, Any] | None:
+        """Merge ``fields`` into one stored version of a song.
+
+        The version is re-read inside the write transaction, so long-running
+        work (synthesis, mixing) can record its result without clobbering
+        changes made meanwhile. The current song row is only touched if it is
+        still at ``version``. Returns the updated version, or None if it no
+        longer exists.
+        """
+
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT data FROM song_versions WHERE song_id = ? AND version = ?", (song_id, version)
+            ).fetchone()
+            if row is None:
+                return None
+            song = json.loads(row[0])
+            song.update(fields)
+            data = json.dumps(song)
+            conn.execute(
+                "UPDATE song_versions SET data = ? WHERE song_id = ? AND version = ?",
+                (data, song_id, version),
+            )
+            conn.execute(
+                "UPDATE songs SET genre = ?, mood = ?, data = ? WHERE id = ? AND version = ?",
+                (song.get("genre"), song.get("mood"), data, song_id, version),
+            )
+        return song
+
+    def add_version(self, song: Dict[str, Any]) -> Dict[str, Any]:
+        """Append ``song`` as the next version; earlier versions are kept.
+
+        The version number is assigned inside the write transaction, so
+        concurrent improvements from different workers cannot collide.
+        """
+
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT MAX(version) FROM song_versions WHERE song_id = ?", (song["id"],)
+            ).fetchone()
+            if row is None or row[0] is None:
+                raise KeyError(song["id"])
+            song["version"] = row[0] + 1
+            data = json.dumps(song)
+            conn.execute(
+                "INSERT INTO song_versions (song_id, version, created_at, data) VALUES (?, ?, ?, ?)",
+                (song["id"], song["version"], song["timestamp"], data),
+            )
+            conn.execute(
+                "UPDATE songs SET genre = ?, mood = ?, version = ?, data = ? WHERE id = ?",
+                (song.get("genre"), song.get("mood"), song["version"], data, song["id"]),
+            )
+        return song
+
+    def delete(self, song_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM songs WHERE id = ?", (song_id,))
+
+    # -- reads ---------------------------------------------------------------
+
+    def get(self, song_id: str) -> Dict[str, Any] | None:
+        row = self._conn().execute("SELECT data FROM songs WHERE id = ?", (song_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_version(self, song_id: str, version: int) -> Dict[str, Any] | None:
+        row = self._conn().execute(
+            "SELECT data FROM song_versions WHERE song_id = ? AND version = ?", (song_id, version)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def versions(self, song_id: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT data FROM song_versions WHERE song_id = ? ORDER BY version", (song_id,)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def list_page(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        genre: str | None = None,
+        mood: str | None = None,
+    ) -> Tuple[List[Dict[str, Any]], str | None]:
+        """Newest-first page of songs plus an opaque cursor for the next page.
+
+        Keyset pagination on ``(created_at, id)`` walks the index from the
+        cursor position, so every page costs the same regardless of how deep
+        into the library it is (unlike ``OFFSET``).
+        """
+
+        where: List[str] = []
+        params: List[Any] = []
+        if genre is not None:
+            where.append("genre = ?")
+            params.append(genre)
+        if mood is not None:
+            where.append("mood = ?")
+            params.append(mood)
+        if cursor:
+            created_at, song_id = _decode_cursor(cursor)
+            where.append("(created_at, id) < (?, ?)")
+            params.extend([created_at, song_id])
+
+        sql = "SELECT id, created_at, data FROM songs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._conn().execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][1], rows[-1][0])
+        return [json.loads(r[2]) for r in rows], next_cursor
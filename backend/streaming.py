@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+# ----------------------------------------------------------------------------
+# Live (in-progress) audio files that clients can follow while they grow
+# ----------------------------------------------------------------------------
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class LiveAudio:
+    """An audio file that is still being written by a single producer.
+
+    The producer appends upstream chunks straight to ``path``; readers open
+    the same file independently and follow it, blocking until more bytes are
+    flushed or the producer finishes. Nothing is buffered in memory beyond
+    one read block per reader, so long tracks cost no more RAM than short
+    ones, and any number of late joiners can attach at any point.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._cond = threading.Condition()
+        self._written = 0
+        self._started = False
+        self._finished = False
+        self.error: str | None = None
+
+        # Create (truncate) the file up front so readers can open it before
+        # the first upstream chunk arrives.
+        self._fh = open(path, "wb")
+
+    # -- producer side -------------------------------------------------------
+
+    def begin(self) -> None:
+        """Mark the producer as running; `follow` timeouts only count from here."""
+
+        with self._cond:
+            self._started = True
+            self._cond.notify_all()
+
+    def append(self, chunk: bytes) -> None:
+        self._fh.write(chunk)
+        self._fh.flush()
+        with self._cond:
+            self._started = True
+            self._written += len(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        # Also releases readers still waiting for `begin` (e.g. the job was
+        # rejected and never ran).
+        if not self._fh.closed:
+            self._fh.close()
+        with self._cond:
+            self._finished = True
+            if error is not None:
+                self.error = str(error)
+            self._cond.notify_all()
+
+    @property
+    def finished(self) -> bool:
+        with self._cond:
+            return self._finished
+
+    # -- consumer side -------------------------------------------------------
+
+    def follow(self, start: int = 0, timeout: float = 60.0) -> Iterator[bytes]:
+        """Yield the file's bytes from ``start`` as they become available.
+
+        Stops at the end of the file once the producer has finished, if the
+        producer failed, or if no new data arrives within ``timeout`` seconds
+        of the producer starting (time spent queued behind other work does
+        not count).
+        """
+
+        pos = start
+        try:
+            fh = open(self.path, "rb")
+        except FileNotFoundError:
+            # The producer failed and removed the partial file before this
+            # reader got to open it.
+            return
+        with fh:
+            fh.seek(pos)
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._started or self._finished)
+                    if self._written <= pos and not self._finished:
+                        self._cond.wait_for(
+                            lambda: self._written > pos or self._finished, timeout=timeout
+                        )
+                    available = self._written - pos
+                    failed = self.error is not None
+
+                if failed:
+                    return
+                if available <= 0:
+                    # Either the producer is done or it stalled past `timeout`.
+                    return
+
+                while available > 0:
+                    block = fh.read(min(available, READ_BLOCK_SIZE))
+                    if not block:
+                        break
+                    pos += len(block)
+                    available -= len(block)
+                    yield block
+
+
+class LiveAudioRegistry:
+    """Index of in-progress :class:`LiveAudio` objects.
+
+    Entries are keyed by song id and, while their producer is still running,
+    by the cache key of the audio being made, so a second request for the
+    same audio can follow the existing stream instead of waiting for it.
+    The song ids that joined are handed to the producer by :meth:`seal`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._live: Dict[str, LiveAudio] = {}
+        self._by_key: Dict[str, LiveAudio] = {}
+        self._followers: Dict[int, List[str]] = {}
+
+    def start_or_join(self, song_id: str, path: Path, key: str) -> Tuple[LiveAudio, bool]:
+        """Attach ``song_id`` to the live audio for ``key``, or start it at ``path``.
+
+        Returns ``(live, started)``; only when ``started`` is true must the
+        caller run a producer for it.
+        """
+
+        with self._lock:
+            live = self._by_key.get(key)
+            if live is not None:
+                self._followers[id(live)].append(song_id)
+                self._live[song_id] = live
+                return live, False
+            live = LiveAudio(path)
+            self._live[song_id] = live
+            self._by_key[key] = live
+            self._followers[id(live)] = []
+            return live, True
+
+    def seal(self, key: str, live: LiveAudio) -> List[str]:
+        """Stop new requests joining ``live`` and return the song ids that did."""
+
+        with self._lock:
+            if self._by_key.get(key) is live:
+                del self._by_key[key]
+            return self._followers.pop(id(live), [])
+
+    def get(self, song_id: str) -> LiveAudio | None:
+        with self._lock:
+            return self._live.get(song_id)
+
+    def discard(self, song_id: str) -> None:
+        with self._lock:
+            self._live.pop(song_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._live)
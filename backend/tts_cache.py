@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# ----------------------------------------------------------------------------
+# Content-addressed cache for synthesized audio
+# ----------------------------------------------------------------------------
+
+# How often `get_into` re-fetches an entry that vanished before it was linked.
+_MAX_LINK_ATTEMPTS = 3
+
+
+def normalize_text(text: str) -> str:
+    """Normalise lyrics so trivially different prompts share a cache entry.
+
+    Unicode is NFC-normalised, whitespace inside each line is collapsed and
+    leading/trailing blank lines are dropped. Line breaks are kept because they
+    change phrasing in the synthesized audio.
+    """
+
+    text = unicodedata.normalize("NFC", text)
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return "\n".join(lines).strip("\n")
+
+
+def make_cache_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    """Hash everything that influences the audio ElevenLabs returns."""
+
+    h = hashlib.sha256()
+    for part in (normalize_text(text), voice_id, model_id, output_format):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class _Flight:
+    """An in-progress synthesis that concurrent callers can wait on."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.error: BaseException | None = None
+
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key         TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    last_used   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used);
+"""
+
+
+class TTSCache:
+    """Disk-backed LRU cache of audio files keyed by :func:`make_cache_key`.
+
+    Entries live as ``<key><suffix>`` files in ``directory``. Recency and
+    sizes are kept in a SQLite index in the same directory, so every worker
+    process sharing it enforces one common budget, and LRU order survives
+    restarts without touching file mtimes (entries are hard-linked into song
+    files, which must keep stable validators).
+
+    Concurrent misses for the same key are coalesced within a process: the
+    first caller runs the producer, everyone else blocks until it finishes
+    and then shares the file. Separate worker processes may each synthesize
+    the same key once. Another process can evict an entry right after it was
+    looked up; :meth:`get_into` / :meth:`lookup_into` treat that as a miss.
+
+    Companion files (``<entry><companion suffix>``, e.g. a frame index) that
+    the producer writes next to its output travel with the entry.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int,
+        max_entries: int,
+        suffix: str = ".mp3",
+        companion_suffixes: Tuple[str, ...] = (),
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.suffix = suffix
+        self.companion_suffixes = companion_suffixes
+        self.index_path = directory / "index.sqlite3"
+
+        self._lock = threading.Lock()  # guards _inflight and the counters
+        self._local = threading.local()
+        self._inflight: Dict[str, _Flight] = {}
+
+        # Per-process counters; entries/bytes in `stats()` are shared.
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(_INDEX_SCHEMA)
+        self._reconcile()
+
+    # -- internals -----------------------------------------------------------
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _path_for(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def _reconcile(self) -> None:
+        """Sync the index with the files on disk (e.g. after a crash or upgrade)."""
+
+        on_disk: Dict[str, os.stat_result] = {}
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                on_disk[path.stem] = path.stat()
+            except OSError:
+                continue
+
+        with self._transaction() as conn:
+            known = {key for (key,) in conn.execute("SELECT key FROM entries")}
+            conn.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key in known - on_disk.keys()]
+            )
+            conn.executemany(
+                "INSERT INTO entries (key, size, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, st.st_size, st.st_mtime)
+                    for key, st in on_disk.items()
+                    if key not in known
+                ],
+            )
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection, keep: str | None = None) -> None:
+        # Never evict `keep` (the entry just written) or the last remaining
+        # entry: an oversized file is still better served once than
+        # re-synthesized.
+        total, count = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+        if total <= self.max_bytes and count <= self.max_entries:
+            return
+
+        victims: List[str] = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if count <= 1 or (total <= self.max_bytes and count <= self.max_entries):
+                break
+            if key == keep:
+                continue
+            victims.append(key)
+            total -= size
+            count -= 1
+
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
+        # Unlinked while we still hold the write lock, so no other process
+        # can re-add one of these keys in between.
+        for key in victims:
+            path = self._path_for(key)
+            for victim in [path, *_companions(path, self.companion_suffixes)]:
+                try:
+                    victim.unlink()
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self.evictions += len(victims)
+
+    def _touch(self, key: str) -> Path | None:
+        path = self._path_for(key)
+        with self._transaction() as conn:
+            cur = conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            if cur.rowcount == 0:
+                return None
+            if not path.exists():
+                # Removed behind our back; forget it and treat as a miss.
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+        return path
+
+    # -- public API ----------------------------------------------------------
+
+    def lookup(self, key: str) -> Path | None:
+        """Return the cached path for ``key`` (counting a hit) or None.
+
+        Misses are not counted here; callers fall through to
+        :meth:`get_or_create`, which does.
+        """
+
+        path = self._touch(key)
+        if path is not None:
+            with self._lock:
+                self.hits += 1
+        return path
+
+    def forget(self, key: str) -> None:
+        """Drop ``key`` from the index, e.g. after its file vanished."""
+
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def get_or_create(self, key: str, produce: Callable[[Path], None]) -> Tuple[Path, bool]:
+        """Return ``(path, hit)`` for ``key``, calling ``produce`` on a miss.
+
+        ``produce`` receives a temporary path to write the audio to; it is
+        moved into the cache atomically once it returns. If it raises, every
+        waiter for the same key sees the same exception.
+        """
+
+        path = self._touch(key)
+        if path is not None:
+            with self._lock:
+                self.hits += 1
+            return path, True
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            path = self._touch(key)
+            if path is None:
+                # Evicted between completion and our wake-up; fetch again.
+                return self.get_or_create(key, produce)
+            return path, True
+
+        final_path = self._path_for(key)
+        # Unique per process and thread: forked workers reuse thread idents.
+        tmp_path = final_path.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            # A previous leader may have finished between our miss and
+            # taking over the flight.
+            path = self._touch(key)
+            if path is not None:
+                return path, True
+            produce(tmp_path)
+            # Companions first: once the entry itself appears, they must too.
+            for tmp_companion, companion in zip(
+                _companions(tmp_path, self.companion_suffixes),
+                _companions(final_path, self.companion_suffixes),
+            ):
+                if tmp_companion.exists():
+                    os.replace(tmp_companion, companion)
+            os.replace(tmp_path, final_path)
+            size = final_path.stat().st_size
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)",
+                    (key, size, time.time()),
+                )
+                self._evict(conn, keep=key)
+        except BaseException as exc:
+            flight.error = exc
+            for leftover in [tmp_path, *_companions(tmp_path, self.companion_suffixes)]:
+                try:
+                    leftover.unlink()
+                except FileNotFoundError:
+                    pass
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+        return final_path, False
+
+    def get_into(self, key: str, dst: Path, produce: Callable[[Path], None]) -> bool:
+        """:meth:`get_or_create`, then materialise the entry at ``dst``.
+
+        Retries if another process evicts the entry before it is linked.
+        Returns True when no new ``produce`` call was needed.
+        """
+
+        attempt = 1
+        while True:
+            path, hit = self.get_or_create(key, produce)
+            try:
+                link_or_copy(path, dst, self.companion_suffixes)
+                return hit
+            except FileNotFoundError:
+                if attempt >= _MAX_LINK_ATTEMPTS:
+                    raise
+                attempt += 1
+                self.forget(key)
+
+    def lookup_into(self, key: str, dst: Path) -> bool:
+        """Materialise a cached entry at ``dst`` if there is one.
+
+        An entry evicted between lookup and link counts as a miss.
+        """
+
+        path = self.lookup(key)
+        if path is None:
+            return False
+        try:
+            link_or_copy(path, dst, self.companion_suffixes)
+        except FileNotFoundError:
+            self.forget(key)
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        total, count = self._conn().execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries"
+        ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "entries": count,
+                "bytes": total,
+                "maxBytes": self.max_bytes,
+                "maxEntries": self.max_entries,
+                "inflight": len(self._inflight),
+                "hitRatio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+
+def _companions(path: Path, suffixes: Iterable[str]) -> List[Path]:
+    return [path.with_name(path.name + suffix) for suffix in suffixes]
+
+
+def link_or_copy(src: Path, dst: Path, companion_suffixes: Iterable[str] = ()) -> None:
+    """Materialise a cache entry at ``dst`` without re-synthesizing.
+
+    A hard link is essentially free and keeps the song file alive even if the
+    cache later evicts ``src``; we fall back to a copy across filesystems.
+    Companion files of ``src`` that exist are linked alongside it.
+    """
+
+    suffixes = list(companion_suffixes)
+    pairs = [
+        (s, d) for s, d in zip(_companions(src, suffixes), _companions(dst, suffixes)) if s.exists()
+    ]
+    for s, d in [*pairs, (src, dst)]:
+        tmp = d.with_name(f".{d.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.link(s, tmp)
+        except OSError:
+            shutil.copyfile(s, tmp)
+        os.replace(tmp, d)